@@ -0,0 +1,159 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import streamlit as st
+
+from orders_core import load_data, invalidate_data, search_orders, rows_to_records
+
+# ==========================================
+# 🔌 API חיפוש ללא Streamlit (מרכזייה / סקריפט מיילים)
+# ==========================================
+# שימוש:
+#   python api_search.py serve --port 8502
+#   python api_search.py lookup 0501234567
+#   curl "http://127.0.0.1:8502/search?q=0501234567&limit=20"
+#
+# משתמש באותו load_data / search_orders כמו המסך, כך שכשהשרת רץ בתוך
+# תהליך ה-Streamlit (api.enabled ב-Secrets) הוא חולק איתו את הנתונים והאינדקסים.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+
+# תוצאות עם פרטי לקוחות - לא מחזירים את כל הטבלה על שאילתה קצרה כמו "0"
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+def _api_token():
+    return st.secrets["api"].get("token") if "api" in st.secrets else None
+
+def lookup(query, limit=DEFAULT_LIMIT):
+    started = time.perf_counter()
+    df = load_data()
+    filtered_df, clean_query = search_orders(df, query)
+    return {
+        "query": clean_query,
+        "count": len(filtered_df),
+        "truncated": len(filtered_df) > limit,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": rows_to_records(filtered_df.head(limit)),
+    }
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    server_version = "OrderSearchAPI/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self, params):
+        token = _api_token()
+        if not token:
+            return True
+        header = self.headers.get("Authorization", "")
+        return header == f"Bearer {token}" or params.get("token", [""])[0] == token
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        if parsed.path == "/health":
+            self._send_json(200, {"status": "ok"})
+            return
+        if not self._authorized(params):
+            self._send_json(401, {"error": "unauthorized"})
+            return
+        if parsed.path != "/search":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        query = params.get("q", [""])[0]
+        if not query.strip():
+            self._send_json(400, {"error": "missing q"})
+            return
+        limit = params.get("limit", [str(DEFAULT_LIMIT)])[0]
+        if not limit.isdigit() or int(limit) < 1:
+            self._send_json(400, {"error": "limit must be a positive integer"})
+            return
+        try:
+            self._send_json(200, lookup(query, min(int(limit), MAX_LIMIT)))
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        params = parse_qs(parsed.query)
+        if not self._authorized(params):
+            self._send_json(401, {"error": "unauthorized"})
+            return
+        if parsed.path != "/refresh":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            invalidate_data()
+            self._send_json(200, {"status": "reloaded", "rows": len(load_data())})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # בלי הדפסה לכל בקשה - המרכזייה שולחת הרבה
+        pass
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), SearchRequestHandler)
+    server.daemon_threads = True
+    return server
+
+# הפעלה מתוך תהליך ה-Streamlit: שרת אחד לתהליך, ב-thread ברקע
+@st.cache_resource(show_spinner=False)
+def start_api_server(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    try:
+        server = make_server(host, port)
+    except OSError as e:
+        # הפורט תפוס (serve נפרד / תהליך Streamlit נוסף) - המסך ממשיך בלי API.
+        # מחזירים None כדי שהתוצאה תישמר ב-cache ולא ננסה שוב בכל ריצה.
+        print(f"Search API not started on {host}:{port}: {e}")
+        return None
+    thread = threading.Thread(target=server.serve_forever, name="order-search-api", daemon=True)
+    thread.start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Order search API / CLI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="run the HTTP/JSON search server")
+    p_serve.add_argument("--host", default=DEFAULT_HOST)
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    p_lookup = sub.add_parser("lookup", help="search once and print JSON")
+    p_lookup.add_argument("query")
+    p_lookup.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        load_data()  # טעינה מראש כדי שהבקשה הראשונה לא תחכה ל-DB
+        server = make_server(args.host, args.port)
+        print(f"Listening on http://{args.host}:{args.port}/search?q=...", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return 0
+
+    result = lookup(args.query, args.limit)
+    print(json.dumps(result, ensure_ascii=False, default=str, indent=2))
+    return 0 if result["count"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,61 +1,29 @@
 import streamlit as st
 import pandas as pd
-import psycopg2
 import requests
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 import re
+import io
+import csv
+import importlib.util
+from functools import partial
+
+from orders_core import (
+    LOG_COLUMN_NAME, get_db_connection, load_data, invalidate_data, table_for_order_type,
+    get_data_version, search_orders, action_key, record_action, last_action_time,
+    normalize_phone, normalize_phone_for_api, format_date_il, format_quantity,
+)
+from api_search import start_api_server
+from profiling import profile_rerun, profiled
+from auth import check_password
 
 # --- הגדרת תצוגה ---
 st.set_page_config(layout="wide", page_title="איתור הזמנות", page_icon="🔎")
 
-# ==========================================
-# 🔐 מנגנון אבטחה (Login)
-# ==========================================
-def check_password():
-    st.markdown("""
-        <style>
-            h1, h2, h3, h4, h5, h6, .stTextInput > label, .stTextInput input, div[data-testid="stMarkdownContainer"] p {
-                direction: rtl !important;
-                text-align: right !important;
-            }
-            .stTextInput > label {
-                width: 100%;
-                display: flex;
-                justify-content: flex-start;
-            }
-            .stButton button {
-                text-align: center;
-            }
-        </style>
-    """, unsafe_allow_html=True)
-
-    if "app_password" not in st.secrets:
-        st.warning("⚠️ לא הוגדרה סיסמה ב-Secrets. הכניסה חופשית.")
-        return True
-
-    def password_entered():
-        if st.session_state["password"] == st.secrets["app_password"]:
-            st.session_state["password_correct"] = True
-            del st.session_state["password"]  
-        else:
-            st.session_state["password_correct"] = False
-
-    if "password_correct" not in st.session_state:
-        st.markdown("### 🔒 התחברות למערכת")
-        st.text_input("הזמן סיסמה", type="password", on_change=password_entered, key="password")
-        return False
-    elif not st.session_state["password_correct"]:
-        st.markdown("### 🔒 התחברות למערכת")
-        st.text_input("הזמן סיסמה", type="password", on_change=password_entered, key="password")
-        st.error("❌ סיסמה שגויה")
-        return False
-    else:
-        return True
-
 if not check_password():
     st.stop()
 
@@ -63,24 +31,6 @@ if not check_password():
 # ⚙️ הגדרות וחיבורים
 # ==========================================
 
-SQL_TO_APP_COLS = {
-    'order_num': 'מספר הזמנה',
-    'customer_name': 'שם לקוח',
-    'phone': 'טלפון',
-    'city': 'עיר',
-    'street': 'רחוב',
-    'house_num': 'מספר בית',
-    'sku': 'מוצר',
-    'quantity': 'כמות',
-    'shipping_num': 'סטטוס משלוח',
-    'order_date': 'תאריך',
-    'message_log': 'לוג מיילים',
-    'order_type': 'סוג הזמנה',
-    'delivery_time': 'raw_delivery_time',
-    'notes': 'הערות' 
-}
-
-LOG_COLUMN_NAME = "לוג מיילים"
 # שליפת אימיילים
 EMAIL_ACE = st.secrets["suppliers"].get("ace_email") if "suppliers" in st.secrets else None
 EMAIL_PAYNGO = st.secrets["suppliers"].get("payngo_email") if "suppliers" in st.secrets else None
@@ -92,58 +42,51 @@ EMAIL_INSTALLER = st.secrets["suppliers"].get("installer_email", "meir22101@gmai
 
 INSTALLATION_PHONE = st.secrets["ultramsg"].get("installation_phone", "0528448382") if "ultramsg" in st.secrets else "0528448382"
 
-def get_db_connection():
-    return psycopg2.connect(
-        host=st.secrets["supabase"]["DB_HOST"],
-        port=st.secrets["supabase"]["DB_PORT"],
-        database=st.secrets["supabase"]["DB_NAME"],
-        user=st.secrets["supabase"]["DB_USER"],
-        password=st.secrets["supabase"]["DB_PASS"],
-        sslmode='require'
-    )
+# חסימת שליחה כפולה: אותה פעולה לאותה שורה בתוך X דקות (0 = כבוי)
+SEND_COOLDOWN_MINUTES = int(st.secrets["guards"].get("send_cooldown_minutes", 10)) if "guards" in st.secrets else 10
+
+# שרת API פנימי (אופציונלי) - חולק עם המסך את אותם נתונים ואינדקסים
+if "api" in st.secrets and st.secrets["api"].get("enabled"):
+    start_api_server(st.secrets["api"].get("host", "127.0.0.1"), int(st.secrets["api"].get("port", 8502)))
 
 # -------------------------------------------
-# 📝 פונקציה לעדכון סטטוס "בטיפול"
+# 📝 מעבר סטטוס מרוכז ("בטיפול" / "עבר לזיכוי")
 # -------------------------------------------
-def start_service_treatment(order_id):
+def regular_order_ids(rows_df):
+    mask = rows_df['_order_type_key'].astype(str).str.contains("Regular Order", regex=False) & rows_df['_row_id'].astype(bool)
+    # המזהים כמו שהם (tolist = טיפוסי פייתון) - psycopg2 ממיר את הרשימה ל-ARRAY בעצמו
+    return list(dict.fromkeys(rows_df.loc[mask, '_row_id'].tolist()))
+
+def bulk_status_transition(order_ids, message, set_service_start=False):
+    # UPDATE אחד בטרנזקציה אחת לכל ההזמנות שנבחרו (טבלת orders בלבד) - גם התאריך וגם הלוג.
+    # מחזיר כמה עודכנו, או None בשגיאת DB (ההודעה כבר הוצגה)
+    if not order_ids:
+        return 0
+    timestamp = datetime.now().strftime("%d/%m %H:%M")
+    new_entry = f"{message} ({timestamp})"
+    set_sql = "message_log = CASE WHEN COALESCE(message_log, '') = '' THEN %s ELSE message_log || ' | ' || %s END"
+    if set_service_start:
+        set_sql = "service_start_date = CURRENT_DATE, " + set_sql
+
     conn = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        query = "UPDATE orders SET service_start_date = CURRENT_DATE WHERE id = %s"
-        cur.execute(query, (order_id,))
+        cur.execute(f"UPDATE orders SET {set_sql} WHERE id = ANY(%s) RETURNING id", (new_entry, new_entry, list(order_ids)))
+        updated_ids = [row[0] for row in cur.fetchall()]
         conn.commit()
         cur.close()
-        return True
+        invalidate_data("orders", updated_ids)
+        return len(updated_ids)
     except Exception as e:
-        st.error(f"שגיאה בעדכון טיפול: {e}")
-        return False
+        if conn:
+            conn.rollback()
+        st.error(f"שגיאה בעדכון סטטוס: {e}")
+        return None
     finally:
         if conn:
             conn.close()
 
-# -------------------------------------------
-# 📥 טעינת נתונים
-# -------------------------------------------
-@st.cache_data
-def load_data():
-    conn = get_db_connection()
-    query = """
-        SELECT 
-            id, order_num, customer_name, phone, city, street, house_num, 
-            sku, quantity, shipping_num, order_date, message_log, order_type, delivery_time, notes
-        FROM all_orders_view
-    """
-    df = pd.read_sql(query, conn)
-    conn.close()
-
-    df = df.rename(columns=SQL_TO_APP_COLS)
-    df = df.fillna("")
-    if LOG_COLUMN_NAME not in df.columns:
-        df[LOG_COLUMN_NAME] = ""
-        
-    return df
-
 # -------------------------------------------
 # 📝 עדכון לוג
 # -------------------------------------------
@@ -152,17 +95,7 @@ def update_log_in_db(order_num, sku, message, order_type_val="Regular Order", ro
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # === תיקון: זיהוי הטבלה החדשה ===
-        if "Pre-Order" in str(order_type_val):
-            target_table = "pre_orders"
-        elif "Pickup" in str(order_type_val):
-             target_table = "pickups"
-        elif "Spare Part" in str(order_type_val):
-             target_table = "spare_parts"
-        elif "Double Delivery" in str(order_type_val): # <--- הוספנו את זה
-             target_table = "double_deliveries"
-        else:
-            target_table = "orders"
+        target_table = table_for_order_type(order_type_val)
         
         timestamp = datetime.now().strftime("%d/%m %H:%M")
         new_entry = f"{message} ({timestamp})"
@@ -184,60 +117,70 @@ def update_log_in_db(order_num, sku, message, order_type_val="Regular Order", ro
         else:
             full_log = new_entry
             
-        update_sql = f"UPDATE {target_table} SET message_log = %s {condition_sql}"
+        update_sql = f"UPDATE {target_table} SET message_log = %s {condition_sql} RETURNING id"
         
         if row_id:
             cursor.execute(update_sql, (full_log, row_id))
         else:
             cursor.execute(update_sql, (full_log, str(order_num), str(sku)))
+        updated_ids = [row[0] for row in cursor.fetchall()]
             
         conn.commit()
         cursor.close()
         conn.close()
-        load_data.clear()
+        invalidate_data(target_table, updated_ids)  # רק הסגמנט של הטבלה שהשתנתה נטען מחדש
+        record_action(action_key(order_num, sku, order_type_val), message)
         return full_log
     except Exception as e:
         print(f"Error updating log: {e}") 
         return None
 
-# --- פונקציות עזר ---
-def normalize_phone(phone_input):
-    if not phone_input: return ""
-    clean_digits = ''.join(filter(str.isdigit, str(phone_input)))
-    if clean_digits.startswith('972'): clean_digits = clean_digits[3:]
-    if clean_digits.startswith('0'): return clean_digits[1:]
-    return clean_digits
-
-def normalize_phone_for_api(phone_input):
-    if not phone_input: return None
-    digits = ''.join(filter(str.isdigit, str(phone_input)))
-    if not digits: return None
-    if digits.startswith('972'): return digits 
-    if digits.startswith('0'): return '972' + digits[1:] 
-    if len(digits) == 9: return '972' + digits
-    return digits 
-
-def clean_input_garbage(val):
-    if not isinstance(val, str): val = str(val)
-    garbage_chars = ['\u200f', '\u200e', '\u202a', '\u202b', '\u202c', '\u202d', '\u202e', '\u00a0', '\t', '\n', '\r']
-    cleaned_val = val
-    for char in garbage_chars:
-        cleaned_val = cleaned_val.replace(char, '')
-    return cleaned_val.strip()
-
-def format_date_il(d):
-    if not d: return ""
-    try:
-        dt = pd.to_datetime(d)
-        return dt.strftime('%d/%m/%Y')
-    except:
-        return str(d)
-
-def format_quantity(q):
-    try:
-        return str(int(float(q)))
-    except:
-        return str(q).replace('.0', '')
+# -------------------------------------------
+# 🛡️ מניעת שליחה כפולה (לפי אינדקס הפעולות שנבנה בטעינה)
+# -------------------------------------------
+# רק שליחות בפועל (ווצאפ / מייל) - לא מעברי סטטוס כמו "בטיפול" / "עבר לזיכוי"
+SEND_ACTIONS = [
+    "💬 נשלח ווצאפ מדיניות", "💬 נשלח 'חזרנו אליך'", "💬 נשלח למתקין",
+    "📧 נשלח בדיקה", "📧 נשלח בדיקה למתקין", "↩️ נשלחה בקשת החזרה",
+    "📧 נשלח עדכון פרטים", "📧 נשלח עדכון למתקין",
+    "📧 נשלח ספק (אין מענה)", "📧 נשלח ספק (ידני)",
+    "📧 נשלחה בקשת זיכוי לספק", "📧 נשלחה בקשת זיכוי (ידני)",
+]
+
+def format_time_ago(ts, now=None):
+    minutes = int(((now or datetime.now()) - ts).total_seconds() // 60)
+    if minutes < 1:
+        return "עכשיו"
+    if minutes < 60:
+        return f"לפני {minutes} דק'"
+    if minutes < 24 * 60:
+        return f"לפני {minutes // 60} שע'"
+    return f"לפני {minutes // (24 * 60)} ימים"
+
+def describe_last_send(last_actions):
+    # זמן מוחלט מהלוג שנטען (לא "לפני X"): הערך קבוע לאותה גרסת נתונים, אז טבלת העריכה
+    # לא מקבלת זהות חדשה כשעוברת דקה ולא מאבדת את הסימונים
+    sends = {a: ts for a, ts in last_actions.items() if a in SEND_ACTIONS}
+    if not sends:
+        return ""
+    action, ts = max(sends.items(), key=lambda item: item[1])
+    return f"{action} · {ts.strftime('%d/%m %H:%M')}"
+
+def has_sent_before(rows_df, actions):
+    return any(last_action_time(k, la, actions) for k, la in zip(rows_df['_action_key'], rows_df['_last_actions']))
+
+def filter_recent_sends(rows_df, actions, label):
+    # מוריד שורות שאחת מהפעולות כבר בוצעה להן בתוך זמן הצינון, ומודיע כמה דולגו
+    if rows_df.empty or not SEND_COOLDOWN_MINUTES:
+        return rows_df
+    now = datetime.now()
+    cutoff = now - timedelta(minutes=SEND_COOLDOWN_MINUTES)
+    last_sent = [last_action_time(k, la, actions) for k, la in zip(rows_df['_action_key'], rows_df['_last_actions'])]
+    blocked = [ts is not None and ts > cutoff for ts in last_sent]
+    if any(blocked):
+        newest = max(ts for ts, b in zip(last_sent, blocked) if b)
+        st.toast(f"⏳ {sum(blocked)} שורות דולגו - '{label}' נשלח {format_time_ago(newest, now)}")
+    return rows_df[[not b for b in blocked]]
 
 # --- שליחה (ווצאפ / מייל) ---
 def send_whatsapp_message(phone, message_body):
@@ -248,7 +191,8 @@ def send_whatsapp_message(phone, message_body):
     token = st.secrets["ultramsg"]["token"]
     clean_phone = normalize_phone_for_api(phone)
     if not clean_phone: return False
-    url = f"https://api.ultramsg.com/{instance_id}/messages/chat"
+    api_base = st.secrets["ultramsg"].get("api_base", "https://api.ultramsg.com")
+    url = f"{api_base}/{instance_id}/messages/chat"
     payload = {"token": token, "to": clean_phone, "body": message_body}
     try:
         headers = {'content-type': 'application/x-www-form-urlencoded'}
@@ -274,8 +218,9 @@ def send_custom_email(subject_line, body_text="", target_email=None):
     msg['Subject'] = subject_line
     msg.attach(MIMEText(body_text, 'plain', 'utf-8'))
     try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
+        server = smtplib.SMTP(st.secrets["email"].get("smtp_host", "smtp.gmail.com"), int(st.secrets["email"].get("smtp_port", 587)))
+        if st.secrets["email"].get("smtp_starttls", True):
+            server.starttls()
         server.login(sender, password)
         server.send_message(msg)
         server.quit()
@@ -294,6 +239,8 @@ def open_update_dialog(rows_df):
         if not user_input.strip():
             st.error("חובה להזין תוכן להודעה")
         else:
+            # בדיקה חוזרת בשליחה עצמה - לחיצה כפולה בתוך החלון
+            rows_df = filter_recent_sends(rows_df, ["📧 נשלח עדכון פרטים", "📧 נשלח עדכון למתקין"], "עדכון פרטים")
             emails_sent = 0
             
             mask_has_tracking = rows_df['_real_tracking'].apply(lambda x: True if (x and str(x).strip().lower() not in ['none', '', 'nan']) else False)
@@ -322,7 +269,7 @@ def open_update_dialog(rows_df):
                 st.success("הבקשה נשלחה בהצלחה!")
                 time.sleep(1.5)
                 st.rerun()
-            else:
+            elif not rows_df.empty:
                 st.error("לא נשלח (אולי שגיאה בחיבור)")
 
 # --- Dialog Function for Manual Supplier Email ---
@@ -335,7 +282,9 @@ def open_manual_supplier_dialog(rows_df):
     if st.button("שלח הודעה"):
         if not target_email or "@" not in target_email:
             st.error("אנא הזן כתובת מייל תקינה")
-        else:
+            return
+        rows_df = filter_recent_sends(rows_df, ["📧 נשלח ספק (אין מענה)", "📧 נשלח ספק (ידני)"], "אין מענה")
+        if not rows_df.empty:
             u_orders = ", ".join(rows_df['מספר הזמנה'].unique())
             u_tracking = ", ".join([t for t in rows_df['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
             u_phones = ", ".join(rows_df['טלפון'].unique())
@@ -382,6 +331,8 @@ def open_refund_dialog(rows_df):
         
         def send_refund_to_supplier(df_group, email_address, supplier_name):
             if df_group.empty or not email_address: return False
+            df_group = filter_recent_sends(df_group, ["📧 נשלחה בקשת זיכוי לספק", "📧 נשלחה בקשת זיכוי (ידני)"], f"זיכוי ({supplier_name})")
+            if df_group.empty: return False
             u_orders = " ".join(df_group['מספר הזמנה'].astype(str).unique())
             u_skus = " ".join(df_group['מוצר'].astype(str).unique())
             # הדרישה: נושא וגוף זהים. מס' הזמנה -> רווח -> מק"ט -> רווח -> המלל.
@@ -400,11 +351,12 @@ def open_refund_dialog(rows_df):
             if send_refund_to_supplier(ksp_g, EMAIL_KSP, "KSP"): emails_sent+=1
             if send_refund_to_supplier(lp_g, EMAIL_LASTPRICE, "Last Price"): emails_sent+=1
         else:
+            rows_df = filter_recent_sends(rows_df, ["📧 נשלחה בקשת זיכוי לספק", "📧 נשלחה בקשת זיכוי (ידני)"], "זיכוי")
             u_orders = " ".join(rows_df['מספר הזמנה'].astype(str).unique())
             u_skus = " ".join(rows_df['מוצר'].astype(str).unique())
             text_to_send = f"{u_orders} {u_skus} {user_input.strip()}"
             
-            if send_custom_email(text_to_send, text_to_send, manual_email):
+            if not rows_df.empty and send_custom_email(text_to_send, text_to_send, manual_email):
                 st.toast(f"בקשת הזיכוי נשלחה ל-{manual_email} ✅")
                 for _, r in rows_df.iterrows(): 
                     update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלחה בקשת זיכוי (ידני)", r['_order_type_key'])
@@ -414,212 +366,207 @@ def open_refund_dialog(rows_df):
             time.sleep(1.5)
             st.rerun()
 
-# ==========================================
-# 🖥️ ממשק משתמש
-# ==========================================
-st.markdown("""
-<style>
-    .stApp { direction: rtl; }
-    .stMarkdown, h1, h3, h2, p, label, .stRadio { text-align: right !important; direction: rtl !important; }
-    .stTextInput input { direction: rtl; text-align: right; }
-    div[data-testid="stDataEditor"] th { text-align: right !important; direction: rtl !important; }
-    div[data-testid="stDataEditor"] td { text-align: right !important; direction: rtl !important; }
-    div[class*="stDataEditor"] div[role="columnheader"] { justify-content: flex-end; }
-    div[class*="stDataEditor"] div[role="gridcell"] { text-align: right; direction: rtl; justify-content: flex-end; }
-    code { text-align: right !important; white-space: pre-wrap !important; direction: rtl !important; }
-    .stButton button { width: 100%; border-radius: 6px; height: 3em; }
-    .block-container { padding-top: 2rem; padding-bottom: 1rem; }
-</style>
-""", unsafe_allow_html=True)
-
-# --- כותרת ---
-col_title, col_refresh = st.columns([6, 1])
-with col_title:
-    st.title("🔎 איתור הזמנות מהיר (משולב)")
-with col_refresh:
-    st.markdown("<br>", unsafe_allow_html=True) 
-    if st.button("🔄 רענן"):
-        load_data.clear()
-        st.rerun()
-
-try:
-    with st.spinner('טוען נתונים מהענן...'):
-        df = load_data()
-    st.success(f"הנתונים נטענו בהצלחה! סה\"כ {len(df)} שורות.")
-except Exception as e:
-    st.error(f"שגיאה בטעינה: {e}")
-    st.stop()
-
-# --- חיפוש ---
-search_query = st.text_input("הכנס טלפון, מספר הזמנה או מספר משלוח:", "")
-
-if search_query:
-    filtered_df = pd.DataFrame()
-    clean_text_query = clean_input_garbage(search_query)
-    clean_phone_query = normalize_phone(clean_text_query)
+# -------------------------------------------
+# 🧮 בניית טבלת התצוגה (נשמרת בסשן לפי שאילתה + גרסת נתונים)
+# -------------------------------------------
+def build_display_df(df, search_query):
+    filtered_df, clean_text_query = search_orders(df, search_query)
+    if filtered_df.empty:
+        return None, clean_text_query
 
-    conditions = []
-    
-    # 1. חיפוש הזמנה
-    mask_order = df['מספר הזמנה'].astype(str).str.contains(clean_text_query, case=False, na=False, regex=False)
-    conditions.append(mask_order)
-
-    # 2. חיפוש משלוח
-    if 'סטטוס משלוח' in df.columns:
-        mask_tracking = df['סטטוס משלוח'].astype(str).str.contains(clean_text_query, case=False, na=False, regex=False)
-        conditions.append(mask_tracking)
-
-    # 3. חיפוש טלפון
-    if clean_phone_query and 'טלפון' in df.columns:
-        phone_col_norm = df['טלפון'].astype(str).apply(normalize_phone)
-        mask_phone = phone_col_norm == clean_phone_query
-        conditions.append(mask_phone)
-
-    if conditions:
-        final_mask = pd.concat(conditions, axis=1).any(axis=1)
-        filtered_df = df[final_mask].copy()
-
-    # --- הצגת תוצאות ---
-    if not filtered_df.empty:
-        try:
-            filtered_df['temp_date'] = pd.to_datetime(filtered_df['תאריך'], errors='coerce')
-            filtered_df = filtered_df.sort_values(by='temp_date', ascending=True)
-        except: pass
-
-        display_rows = []
-        for index, row in filtered_df.iterrows():
-            
-            order_num = str(row['מספר הזמנה']).strip()
-            qty = format_quantity(row['כמות'])
-            date_val = format_date_il(row['תאריך'])
-            sku = str(row['מוצר']).strip()
-            full_name = str(row['שם לקוח']).strip()
-            street = str(row['רחוב']).strip()
-            house = str(row['מספר בית']).strip()
-            city = str(row['עיר']).strip()
-            address_display = f"{street} {house} {city}".strip()
-            
-            phone_raw = row['טלפון']
-            phone_clean = normalize_phone(phone_raw)
-            phone_display = "0" + phone_clean if phone_clean else ""
-            
-            notes_val = str(row.get('הערות', '')).strip()
-            order_type_raw = str(row.get('סוג הזמנה', 'Regular Order'))
-            delivery_time_raw = str(row.get('raw_delivery_time', '')).strip()
-            
-            # --- לוגיקות תצוגה ---
-            if "Pickup" in order_type_raw:
-                display_delivery_text = "" 
-            elif "Spare Part" in order_type_raw:
-                display_delivery_text = "עד 10 ימי עסקים"
-            elif "Double Delivery" in order_type_raw: # <--- חדש
-                display_delivery_text = "אספקה ואיסוף (עד 14 ימי עסקים)"
-            elif "Pre-Order" in order_type_raw:
-                if delivery_time_raw and delivery_time_raw.lower() != 'none':
-                    display_delivery_text = f"עד {delivery_time_raw} ימי עסקים"
-                else:
-                    display_delivery_text = "זמן אספקה ארוך"
+    display_rows = []
+    for index, row in filtered_df.iterrows():
+        
+        order_num = str(row['מספר הזמנה']).strip()
+        qty = format_quantity(row['כמות'])
+        date_val = format_date_il(row['תאריך'])
+        sku = str(row['מוצר']).strip()
+        full_name = str(row['שם לקוח']).strip()
+        street = str(row['רחוב']).strip()
+        house = str(row['מספר בית']).strip()
+        city = str(row['עיר']).strip()
+        address_display = f"{street} {house} {city}".strip()
+        
+        phone_raw = row['טלפון']
+        phone_clean = normalize_phone(phone_raw)
+        phone_display = "0" + phone_clean if phone_clean else ""
+        
+        notes_val = str(row.get('הערות', '')).strip()
+        order_type_raw = str(row.get('סוג הזמנה', 'Regular Order'))
+        delivery_time_raw = str(row.get('raw_delivery_time', '')).strip()
+        
+        # --- לוגיקות תצוגה ---
+        if "Pickup" in order_type_raw:
+            display_delivery_text = "" 
+        elif "Spare Part" in order_type_raw:
+            display_delivery_text = "עד 10 ימי עסקים"
+        elif "Double Delivery" in order_type_raw: # <--- חדש
+            display_delivery_text = "אספקה ואיסוף (עד 14 ימי עסקים)"
+        elif "Pre-Order" in order_type_raw:
+            if delivery_time_raw and delivery_time_raw.lower() != 'none':
+                display_delivery_text = f"עד {delivery_time_raw} ימי עסקים"
             else:
-                display_delivery_text = "עד 10-14 ימי עסקים"
+                display_delivery_text = "זמן אספקה ארוך"
+        else:
+            display_delivery_text = "עד 10-14 ימי עסקים"
 
-            # שמירת המספר המקורי ללוגיקה
-            raw_tracking_val = str(row['סטטוס משלוח']).strip() 
-            tracking = raw_tracking_val 
-            
-            # לוגיקת תצוגה (לטבלה בלבד)
-            if not tracking or tracking == "None":
-                # הוספנו את Double Delivery לרשימה של דברים שאין להם "התקנה" כברירת מחדל
-                if any(x in order_type_raw for x in ["Pre-Order", "Pickup", "Spare Part", "Double Delivery"]):
-                    tracking = "" 
-                else:
-                    tracking = "התקנה"
-            
-            # תגיות יפות לטבלה
-            if "Pickup" in order_type_raw:
-                tracking = "איסוף"
-            elif "Spare Part" in order_type_raw:
-                tracking = "חלקי חילוף"
-            elif "Double Delivery" in order_type_raw: # <--- חדש
-                tracking = "משלוח כפול"
-
-            log_val = str(row.get(LOG_COLUMN_NAME, ""))
-            first_name = full_name.split()[0] if full_name else ""
-            
-            # טקסט להעתקה - מציג מספר משלוח אם קיים, גם באיסוף/חלקים
-            text_line_tracking = tracking
-            if raw_tracking_val and raw_tracking_val != "None" and tracking in ["איסוף", "חלקי חילוף", "משלוח כפול"]:
-                text_line_tracking = raw_tracking_val
-
-            base_text_line = f"פרטי הזמנה: מספר הזמנה: {order_num}, כמות: {qty}, מק\"ט: {sku}, שם: {full_name}, כתובת: {address_display}, טלפון: {phone_display}, מספר משלוח: {text_line_tracking}, תאריך: {date_val}, זמן אספקה: {display_delivery_text}"
-            if notes_val:
-                base_text_line += f", הערות: {notes_val}"
-            
-            display_rows.append({
-                "מספר הזמנה": order_num,
-                "שם לקוח": full_name,
-                "טלפון": phone_display,
-                "כתובת מלאה": address_display,
-                "מוצר": sku,
-                "כמות": qty,
-                "סטטוס משלוח": tracking, # Table shows "Pickup"/"Spare Part"
-                "תאריך": date_val,
-                "זמן אספקה": display_delivery_text,
-                "הערות": notes_val,
-                LOG_COLUMN_NAME: log_val,
-                "בחר": False,
-                "_excel_line": f"{order_num}\t{qty}\t{sku}\t{first_name}\t{street}\t{house}\t{city}\t{phone_display}",
-                "_text_line": base_text_line,
-                "_raw_phone": str(phone_raw).strip(),
-                "_order_key": order_num,
-                "_sku_key": sku,
-                "_order_type_key": order_type_raw,
-                "_row_id": row.get('id'),
-                "_real_tracking": raw_tracking_val # המספר האמיתי ללוגיקת כפתורים
-            })
+        # שמירת המספר המקורי ללוגיקה
+        raw_tracking_val = str(row['סטטוס משלוח']).strip() 
+        tracking = raw_tracking_val 
+        
+        # לוגיקת תצוגה (לטבלה בלבד)
+        if not tracking or tracking == "None":
+            # הוספנו את Double Delivery לרשימה של דברים שאין להם "התקנה" כברירת מחדל
+            if any(x in order_type_raw for x in ["Pre-Order", "Pickup", "Spare Part", "Double Delivery"]):
+                tracking = "" 
+            else:
+                tracking = "התקנה"
         
-        display_df = pd.DataFrame(display_rows)
-        cols_order = [LOG_COLUMN_NAME, "הערות", "סטטוס משלוח", "מוצר", "כמות", "זמן אספקה", "מספר הזמנה", "בחר"]
+        # תגיות יפות לטבלה
+        if "Pickup" in order_type_raw:
+            tracking = "איסוף"
+        elif "Spare Part" in order_type_raw:
+            tracking = "חלקי חילוף"
+        elif "Double Delivery" in order_type_raw: # <--- חדש
+            tracking = "משלוח כפול"
+
+        log_val = str(row.get(LOG_COLUMN_NAME, ""))
         
-        edited_df = st.data_editor(
-            display_df[cols_order],
-            use_container_width=False,  
-            hide_index=True,
-            column_config={
-                "בחר": st.column_config.CheckboxColumn("בחר", default=False, width="small"),
-                "מספר הזמנה": st.column_config.TextColumn("מספר הזמנה", width="medium"),
-                "זמן אספקה": st.column_config.TextColumn("זמן אספקה", width="medium"),
-                "הערות": st.column_config.TextColumn("הערות", width="medium"),
-                "כמות": st.column_config.TextColumn("כמות", width="small"),
-                "מוצר": st.column_config.TextColumn("מוצר", width="large"),
-                "סטטוס משלוח": st.column_config.TextColumn("מס משלוח", width="medium"),
-                LOG_COLUMN_NAME: st.column_config.TextColumn("לוג", disabled=True, width="large")
-            },
-            disabled=["מספר הזמנה", "מוצר", "כמות", "סטטוס משלוח", LOG_COLUMN_NAME, "זמן אספקה", "הערות"]
-        )
-
-        selected_indices = edited_df[edited_df["בחר"] == True].index
-        rows_for_action = display_df.loc[selected_indices] if not selected_indices.empty else display_df 
-        is_implicit_select_all = selected_indices.empty
-        show_bulk_warning = (is_implicit_select_all and len(rows_for_action) > 10)
-
-# --- כפתורים (חלוקה חכמה עם Popovers) ---
-        st.markdown("<br>", unsafe_allow_html=True)
-        col_wa, col_delivery, col_supplier, col_system = st.columns(4, gap="small")
+        # טקסט להעתקה - מציג מספר משלוח אם קיים, גם באיסוף/חלקים
+        text_line_tracking = tracking
+        if raw_tracking_val and raw_tracking_val != "None" and tracking in ["איסוף", "חלקי חילוף", "משלוח כפול"]:
+            text_line_tracking = raw_tracking_val
         
-        # 1. עמודת וואטסאפ (תפריט נפתח)
-        with col_wa:
-            with st.popover("💬 פעולות וואטסאפ (לקוח/מתקין)", use_container_width=True):
-                # מדיניות
-                if not show_bulk_warning and st.button("💬 שלח מדיניות", use_container_width=True):
-                    if rows_for_action.empty: st.toast("⚠️ אין נתונים")
-                    else:
-                        count = 0
-                        for phone, group in rows_for_action.groupby('_raw_phone'):
-                            if not phone: continue
-                            orders_str = ", ".join(group['מספר הזמנה'].unique())
-                            skus_str = ", ".join(group['מוצר'].unique())
-                            client_name = group.iloc[0]['שם לקוח'].split()[0] if group.iloc[0]['שם לקוח'] else "לקוח"
-                            msg_body = f"""שלום {client_name},
+        display_rows.append({
+            "מספר הזמנה": order_num,
+            "שם לקוח": full_name,
+            "טלפון": phone_display,
+            "כתובת מלאה": address_display,
+            "מוצר": sku,
+            "כמות": qty,
+            "סטטוס משלוח": tracking, # Table shows "Pickup"/"Spare Part"
+            "תאריך": date_val,
+            "זמן אספקה": display_delivery_text,
+            "הערות": notes_val,
+            LOG_COLUMN_NAME: log_val,
+            "בחר": False,
+            "_street": street,
+            "_house": house,
+            "_city": city,
+            "_text_tracking": text_line_tracking,
+            "_raw_phone": str(phone_raw).strip(),
+            "_order_key": order_num,
+            "_sku_key": sku,
+            "_order_type_key": order_type_raw,
+            "_row_id": row.get('id'),
+            "_action_key": action_key(order_num, sku, order_type_raw),
+            "_last_actions": row.get('_last_actions') or {},
+            "נשלח לאחרונה": describe_last_send(row.get('_last_actions') or {}),
+            "_real_tracking": raw_tracking_val # המספר האמיתי ללוגיקת כפתורים
+        })
+
+    return pd.DataFrame(display_rows), clean_text_query
+
+def get_display_df(df, search_query):
+    # רשומה אחת לכל סשן, בלי pickle: ריצה חוזרת של הדף על אותה שאילתה לא בונה את הטבלה שוב,
+    # ושאילתה רחבה (למשל "0") לא נשמרת כעותק נוסף של רוב הנתונים ב-cache משותף
+    cache_key = (get_data_version(df), search_query)
+    cached = st.session_state.get("_display_df_cache")
+    if cached and cached[0] == cache_key:
+        return cached[1]
+    result = build_display_df(df, search_query)
+    st.session_state["_display_df_cache"] = (cache_key, result)
+    return result
+
+# -------------------------------------------
+# 📤 ייצוא / העתקה - נבנה רק כשמציגים או מורידים, שורה אחר שורה
+# -------------------------------------------
+EXPORT_HEADERS = ["מספר הזמנה", "כמות", "מק\"ט", "שם לקוח", "רחוב", "מספר בית", "עיר", "טלפון", "מספר משלוח", "תאריך", "זמן אספקה", "הערות"]
+EXPORT_SOURCE_COLS = ["מספר הזמנה", "כמות", "מוצר", "שם לקוח", "_street", "_house", "_city", "טלפון", "_text_tracking", "תאריך", "זמן אספקה", "הערות"]
+
+# תא שמתחיל באחד מאלה נפתח באקסל כנוסחה - שדות חופשיים (הערות, שם, רחוב) לא נכתבים כמו שהם
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def iter_export_rows(rows_df):
+    yield from zip(*(rows_df[c] for c in EXPORT_SOURCE_COLS))
+
+def escape_csv_cell(val):
+    return f"'{val}" if isinstance(val, str) and val.startswith(FORMULA_PREFIXES) else val
+
+def iter_excel_lines(rows_df):
+    for order_num, qty, sku, full_name, street, house, city, phone, *_ in iter_export_rows(rows_df):
+        first_name = full_name.split()[0] if full_name else ""
+        yield f"{order_num}\t{qty}\t{sku}\t{first_name}\t{street}\t{house}\t{city}\t{phone}"
+
+def iter_text_lines(rows_df):
+    for order_num, qty, sku, full_name, street, house, city, phone, tracking, date_val, delivery, notes in iter_export_rows(rows_df):
+        address_display = f"{street} {house} {city}".strip()
+        line = f"פרטי הזמנה: מספר הזמנה: {order_num}, כמות: {qty}, מק\"ט: {sku}, שם: {full_name}, כתובת: {address_display}, טלפון: {phone}, מספר משלוח: {tracking}, תאריך: {date_val}, זמן אספקה: {delivery}"
+        if notes:
+            line += f", הערות: {notes}"
+        yield line
+
+def export_csv(rows_df):
+    buf = io.BytesIO()
+    text = io.TextIOWrapper(buf, encoding="utf-8-sig", newline="")  # BOM כדי שאקסל יזהה עברית
+    writer = csv.writer(text)
+    writer.writerow(EXPORT_HEADERS)
+    writer.writerows([escape_csv_cell(v) for v in row] for row in iter_export_rows(rows_df))
+    text.flush()
+    text.detach()
+    buf.seek(0)
+    return buf
+
+def export_xlsx(rows_df):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    wb = Workbook(write_only=True)  # כתיבה שורה-שורה בלי להחזיק את כל הגיליון בזיכרון
+    ws = wb.create_sheet("הזמנות")
+    ws.sheet_view.rightToLeft = True
+    ws.append(EXPORT_HEADERS)
+    for row in iter_export_rows(rows_df):
+        cells = []
+        for val in row:
+            cell = WriteOnlyCell(ws, value=val)
+            if isinstance(val, str) and val.startswith("="):
+                cell.data_type = "s"  # טקסט, לא נוסחה
+            cells.append(cell)
+        ws.append(cells)
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return buf
+
+def render_export_buttons(rows_for_action):
+    stamp = datetime.now().strftime("%Y%m%d_%H%M")
+    col_csv, col_xlsx, _ = st.columns([1, 1, 4], gap="small")
+    # data כ-callable: הקובץ נבנה רק בלחיצה, בלי rerun
+    with col_csv:
+        st.download_button("⬇️ הורדת CSV", data=partial(export_csv, rows_for_action), file_name=f"orders_{stamp}.csv",
+                           mime="text/csv", on_click="ignore", use_container_width=True)
+    if importlib.util.find_spec("openpyxl"):
+        with col_xlsx:
+            st.download_button("⬇️ הורדת Excel", data=partial(export_xlsx, rows_for_action), file_name=f"orders_{stamp}.xlsx",
+                               mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", on_click="ignore", use_container_width=True)
+
+# -------------------------------------------
+# 🧩 תפריטי פעולות - כל אחד fragment עצמאי (לחיצה מריצה רק אותו)
+# -------------------------------------------
+@st.fragment
+@profiled("whatsapp_actions")
+def render_whatsapp_actions(rows_for_action, show_bulk_warning):
+    with st.popover("💬 פעולות וואטסאפ (לקוח/מתקין)", use_container_width=True):
+        # מדיניות
+        if not show_bulk_warning and st.button("💬 שלח מדיניות", use_container_width=True):
+            if rows_for_action.empty: st.toast("⚠️ אין נתונים")
+            else:
+                count = 0
+                for phone, group in filter_recent_sends(rows_for_action, ["💬 נשלח ווצאפ מדיניות"], "מדיניות").groupby('_raw_phone'):
+                    if not phone: continue
+                    orders_str = ", ".join(group['מספר הזמנה'].unique())
+                    skus_str = ", ".join(group['מוצר'].unique())
+                    client_name = group.iloc[0]['שם לקוח'].split()[0] if group.iloc[0]['שם לקוח'] else "לקוח"
+                    msg_body = f"""שלום {client_name},
 מדברים לגבי הזמנה/ות: {orders_str}.
 מוצרים: {skus_str}.
 הבנתי שיש בעיה במוצר/ים (פגם או חוסר בחלקים) או שאתה פשוט מעוניין להחזיר.
@@ -628,239 +575,352 @@ if search_query:
 2. אם זה *מוצר פגום* - אנא שלח לנו תמונות ברורות של הפגמים, ונציג מטעמנו יחזור אליך לגבי המשך הטיפול (עד 3 ימי עסקים).
 3. במידה ו*חסרים חלקים* - נא לשלוח לנו את מספרי החלקים החסרים במדויק לפי דף ההוראות (מופיע בחוברת ההרכבה), ונדאג להשלים לך אותם.
 תודה!"""
-                            if send_whatsapp_message(phone, msg_body):
-                                count += 1
-                                for _, r in group.iterrows():
-                                    update_log_in_db(r['_order_key'], r['_sku_key'], "💬 נשלח ווצאפ מדיניות", r['_order_type_key'])
-                                st.toast(f"נשלח ל-{client_name} ✅")
-                        if count > 0:
-                            time.sleep(1)
-                            st.rerun()
-
-                # חזרנו אליך
-                if not show_bulk_warning and st.button("📞 חזרנו אליך", use_container_width=True):
-                    if rows_for_action.empty: st.toast("⚠️ אין נתונים")
-                    else:
-                        count = 0
-                        for phone, group in rows_for_action.groupby('_raw_phone'):
-                            if not phone: continue
-                            orders_str = ", ".join(group['מספר הזמנה'].unique())
-                            skus_str = ", ".join(group['מוצר'].unique())
-                            tracking_str = ", ".join(group['סטטוס משלוח'].unique())
-                            client_name = group.iloc[0]['שם לקוח'].split()[0]
-                            msg_body = f"""היי {client_name},
+                    if send_whatsapp_message(phone, msg_body):
+                        count += 1
+                        for _, r in group.iterrows():
+                            update_log_in_db(r['_order_key'], r['_sku_key'], "💬 נשלח ווצאפ מדיניות", r['_order_type_key'])
+                        st.toast(f"נשלח ל-{client_name} ✅")
+                if count > 0:
+                    time.sleep(1)
+                    st.rerun()
+
+        # חזרנו אליך
+        if not show_bulk_warning and st.button("📞 חזרנו אליך", use_container_width=True):
+            if rows_for_action.empty: st.toast("⚠️ אין נתונים")
+            else:
+                count = 0
+                for phone, group in filter_recent_sends(rows_for_action, ["💬 נשלח 'חזרנו אליך'"], "חזרנו אליך").groupby('_raw_phone'):
+                    if not phone: continue
+                    orders_str = ", ".join(group['מספר הזמנה'].unique())
+                    skus_str = ", ".join(group['מוצר'].unique())
+                    tracking_str = ", ".join(group['סטטוס משלוח'].unique())
+                    client_name = group.iloc[0]['שם לקוח'].split()[0]
+                    msg_body = f"""היי {client_name},
 חוזרים אלייך מסלימפרייס לגבי הזמנה/ות: {orders_str}
 מוצרים: {skus_str}
 מס משלוח/ים: {tracking_str}
 קיבלנו פנייה שחיפשת אותנו, איך אפשר לעזור?"""
-                            if send_whatsapp_message(phone, msg_body):
-                                count += 1
-                                for _, r in group.iterrows():
-                                    update_log_in_db(r['_order_key'], r['_sku_key'], "💬 נשלח 'חזרנו אליך'", r['_order_type_key'])
-                                st.toast(f"נשלח ל-{client_name} ✅")
-                        if count > 0:
-                            time.sleep(1)
-                            st.rerun()
-
-                # התקנה
-                if not show_bulk_warning and st.button("🔧 התקנה", use_container_width=True):
-                    if rows_for_action.empty: st.toast("⚠️ אין נתונים")
-                    else:
-                        all_msgs = []
-                        for order_num, group in rows_for_action.groupby('מספר הזמנה'):
-                            r = group.iloc[0]
-                            items = ", ".join([f"{row['כמות']} X {row['מוצר']}" for _, row in group.iterrows()])
-                            line = f"{order_num} | {items} | {r['שם לקוח']} | {r['כתובת מלאה']} | {r['טלפון']} | התקנה"
-                            all_msgs.append(line)
-                        if send_whatsapp_message(INSTALLATION_PHONE, "\n\n".join(all_msgs)):
-                            st.toast("נשלח למחסני חשמל")
-                            for _, r in rows_for_action.iterrows():
-                                 update_log_in_db(r['_order_key'], r['_sku_key'], "💬 נשלח למתקין", r['_order_type_key'])
-                            time.sleep(1)
-                            st.rerun()
-
-        # 2. עמודת חברת שליחויות (תפריט נפתח)
-        with col_delivery:
-            with st.popover("📦 פעולות ח' שליחויות (מיילים)", use_container_width=True):
-                # מה קורה?
-                if not show_bulk_warning and st.button("❓ מה קורה?", use_container_width=True):
-                    duplicate_alert = False
-                    for _, r in rows_for_action.iterrows():
-                         if "נשלח בדיקה" in str(r[LOG_COLUMN_NAME]): duplicate_alert = True
-                    if duplicate_alert:
-                         st.toast("⚠️ שים לב: כבר נשלח בעבר")
-                         time.sleep(1)
-                    
-                    emails_sent = 0
-                    mask_has_tracking = rows_for_action['_real_tracking'].apply(lambda x: True if (x and str(x).strip().lower() not in ['none', '', 'nan']) else False)
-                    df_shipping = rows_for_action[mask_has_tracking]
-                    df_installer = rows_for_action[~mask_has_tracking]
-                    
-                    if not df_shipping.empty:
-                        trackings = list(set([str(t).strip() for t in df_shipping['_real_tracking']]))
-                        subj = f"{', '.join(trackings)} מה קורה עם זה בבקשה?" if len(trackings)==1 else f"{', '.join(trackings)} מה קורה עם אלה בבקשה?"
-                        if send_custom_email(subj, target_email=None):
-                            emails_sent += 1
-                            for _, r in df_shipping.iterrows():
-                                update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח בדיקה", r['_order_type_key'])
-                    
-                    if not df_installer.empty:
-                        orders = list(set([str(o).strip() for o in df_installer['מספר הזמנה']]))
-                        subj = f"{', '.join(orders)} מה קורה עם זה בבקשה?"
-                        if send_custom_email(subj, target_email=EMAIL_INSTALLER):
-                            emails_sent += 1
-                            for _, r in df_installer.iterrows():
-                                update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח בדיקה למתקין", r['_order_type_key'])
-
-                    if emails_sent > 0:
-                        st.success(f"נשלחו {emails_sent} מיילים")
-                        time.sleep(1)
-                        st.rerun()
-
-                # להחזיר
-                if not show_bulk_warning and st.button("↩️ להחזיר", use_container_width=True):
-                    emails_sent = 0
-                    mask_has_tracking = rows_for_action['_real_tracking'].apply(lambda x: True if (x and str(x).strip().lower() not in ['none', '', 'nan']) else False)
-                    df_shipping = rows_for_action[mask_has_tracking]
-                    df_installer = rows_for_action[~mask_has_tracking]
-                    
-                    if not df_shipping.empty:
-                        trackings = list(set([str(t).strip() for t in df_shipping['_real_tracking']]))
-                        subj = f"{', '.join(trackings)} להחזיר אלינו בבקשה"
-                        if send_custom_email(subj, target_email=None):
-                            emails_sent += 1
-                    
-                    if not df_installer.empty:
-                        orders = list(set([str(o).strip() for o in df_installer['מספר הזמנה']]))
-                        subj = f"{', '.join(orders)} להחזיר אלינו בבקשה"
-                        if send_custom_email(subj, target_email=EMAIL_INSTALLER):
-                            emails_sent += 1
-
-                    if emails_sent > 0:
-                        st.success(f"נשלחו {emails_sent} בקשות החזרה")
-
-                # עדכון פרטים
-                if not show_bulk_warning and st.button("📝 עדכון פרטים", use_container_width=True):
-                    if rows_for_action.empty: st.toast("⚠️ לא נבחרו שורות")
-                    else:
-                         open_update_dialog(rows_for_action)
-
-        # 3. עמודת ספקים (תפריט נפתח)
-        with col_supplier:
-            with st.popover("📧 פעולות ספקים (מיילים)", use_container_width=True):
-                # אין מענה
-                if not show_bulk_warning and st.button("📞 אין מענה", use_container_width=True):
-                    ace_g = rows_for_action[rows_for_action['מספר הזמנה'].astype(str).str.upper().str.startswith("PO")]
-                    pay_g = rows_for_action[rows_for_action['מספר הזמנה'].astype(str).str.startswith("9")]
-                    ksp_g = rows_for_action[(rows_for_action['מספר הזמנה'].astype(str).str.startswith("31")) & (rows_for_action['מספר הזמנה'].astype(str).str.len() == 8)]
-                    lp_g = rows_for_action[(rows_for_action['מספר הזמנה'].astype(str).str.startswith("32")) & (rows_for_action['מספר הזמנה'].astype(str).str.len() == 7)]
-
-                    found_supplier = False
-                    if not ace_g.empty and EMAIL_ACE:
-                        found_supplier = True
-                        u_orders = ", ".join(ace_g['מספר הזמנה'].unique())
-                        u_tracking = ", ".join([t for t in ace_g['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
-                        u_phones = ", ".join(ace_g['טלפון'].unique())
-                        subj = f"{u_orders} {u_tracking} - אין מענה מהלקוח - האם יש מספר טלפון אחר?"
-                        body = f"הטלפון שיש לנו כרגע הוא: {u_phones}\nנא בדקו אם יש מספר אחר."
-                        if send_custom_email(subj, body, EMAIL_ACE):
-                            st.toast("נשלח לאייס")
-                            for _, r in ace_g.iterrows(): update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח ספק (אין מענה)", r['_order_type_key'])
-                    
-                    if not pay_g.empty and EMAIL_PAYNGO:
-                        found_supplier = True
-                        u_orders = ", ".join(pay_g['מספר הזמנה'].unique())
-                        u_tracking = ", ".join([t for t in pay_g['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
-                        u_phones = ", ".join(pay_g['טלפון'].unique())
-                        subj = f"{u_orders} {u_tracking} - אין מענה מהלקוח - האם יש מספר טלפון אחר?"
-                        body = f"הטלפון שיש לנו כרגע הוא: {u_phones}\nנא בדקו אם יש מספר אחר."
-                        if send_custom_email(subj, body, EMAIL_PAYNGO):
-                            st.toast("נשלח למחסני חשמל")
-                            for _, r in pay_g.iterrows(): update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח ספק (אין מענה)", r['_order_type_key'])
-
-                    if not ksp_g.empty and EMAIL_KSP:
-                        found_supplier = True
-                        u_orders = ", ".join(ksp_g['מספר הזמנה'].unique())
-                        u_tracking = ", ".join([t for t in ksp_g['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
-                        u_phones = ", ".join(ksp_g['טלפון'].unique())
-                        subj = f"{u_orders} {u_tracking} - אין מענה מהלקוח - האם יש מספר טלפון אחר?"
-                        body = f"הטלפון שיש לנו כרגע הוא: {u_phones}\nנא בדקו אם יש מספר אחר."
-                        if send_custom_email(subj, body, EMAIL_KSP):
-                            st.toast("נשלח ל-KSP")
-                            for _, r in ksp_g.iterrows(): update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח ספק (אין מענה)", r['_order_type_key'])
-
-                    if not lp_g.empty and EMAIL_LASTPRICE:
-                        found_supplier = True
-                        u_orders = ", ".join(lp_g['מספר הזמנה'].unique())
-                        u_tracking = ", ".join([t for t in lp_g['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
-                        u_phones = ", ".join(lp_g['טלפון'].unique())
-                        subj = f"{u_orders} {u_tracking} - אין מענה מהלקוח - האם יש מספר טלפון אחר?"
-                        body = f"הטלפון שיש לנו כרגע הוא: {u_phones}\nנא בדקו אם יש מספר אחר."
-                        if send_custom_email(subj, body, EMAIL_LASTPRICE):
-                            st.toast("נשלח ל-Last Price")
-                            for _, r in lp_g.iterrows(): update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח ספק (אין מענה)", r['_order_type_key'])
-                    
-                    if not found_supplier: 
-                        open_manual_supplier_dialog(rows_for_action)
-                    else: 
-                        time.sleep(1)
-                        st.rerun()
-
-                # זיכוי
-                if not show_bulk_warning and st.button("💸 זיכוי", use_container_width=True):
-                    if rows_for_action.empty: 
-                        st.toast("⚠️ לא נבחרו שורות")
-                    else:
-                        open_refund_dialog(rows_for_action)
-
-        # 4. עמודת פעולות שירות (תפריט נפתח)
-        with col_system:
-            with st.popover("🛠️ פעולות שירות", use_container_width=True):
-                # בטיפול
-                if not show_bulk_warning and st.button("🛠️ בטיפול", use_container_width=True):
-                    if rows_for_action.empty: st.toast("⚠️ לא נבחרו הזמנות")
-                    else:
-                        success_count = 0
-                        for index, row in rows_for_action.iterrows():
-                            if "Regular Order" in str(row['_order_type_key']) and row['_row_id']:
-                                if start_service_treatment(row['_row_id']):
-                                    update_log_in_db(row['_order_key'], row['_sku_key'], "🛠️ סומן 'בטיפול'", row['_order_type_key'], row_id=row['_row_id'])
-                                    success_count += 1
-
-                        if success_count > 0:
-                            st.toast(f"✅ {success_count} הזמנות עברו לסטטוס 'בטיפול'!", icon="👨‍🔧")
-                            time.sleep(1)
-                            load_data.clear()
-                            st.rerun()
-                        else:
-                            st.toast("⚠️ לא נבחרו הזמנות רגילות לטיפול", icon="🛑")
-
-                # עבר לזיכוי
-                if not show_bulk_warning and st.button("💸 עבר לזיכוי", use_container_width=True):
-                    if rows_for_action.empty: st.toast("⚠️ לא נבחרו הזמנות")
-                    else:
-                        success_count = 0
-                        for index, row in rows_for_action.iterrows():
-                            if "Regular Order" in str(row['_order_type_key']) and row['_row_id']:
-                                update_log_in_db(row['_order_key'], row['_sku_key'], "💸 עבר לזיכוי", row['_order_type_key'], row_id=row['_row_id'])
-                                success_count += 1
-
-                        if success_count > 0:
-                            st.toast(f"✅ {success_count} הזמנות סומנו 'עבר לזיכוי'!", icon="💸")
-                            time.sleep(1)
-                            load_data.clear()
-                            st.rerun()
-                        else:
-                            st.toast("⚠️ לא נבחרו הזמנות רגילות לזיכוי", icon="🛑")
-
-        st.divider()
-        if not rows_for_action.empty and not show_bulk_warning:
-            st.caption("העתקה לאקסל:")
-            st.code("\n".join(rows_for_action["_excel_line"]), language="csv")
-            st.caption("פרטים מלאים:")
-            st.code("\n".join(rows_for_action["_text_line"]), language=None)
+                    if send_whatsapp_message(phone, msg_body):
+                        count += 1
+                        for _, r in group.iterrows():
+                            update_log_in_db(r['_order_key'], r['_sku_key'], "💬 נשלח 'חזרנו אליך'", r['_order_type_key'])
+                        st.toast(f"נשלח ל-{client_name} ✅")
+                if count > 0:
+                    time.sleep(1)
+                    st.rerun()
+
+        # התקנה
+        if not show_bulk_warning and st.button("🔧 התקנה", use_container_width=True):
+            if rows_for_action.empty: st.toast("⚠️ אין נתונים")
+            else:
+                rows = filter_recent_sends(rows_for_action, ["💬 נשלח למתקין"], "התקנה")
+                all_msgs = []
+                for order_num, group in rows.groupby('מספר הזמנה'):
+                    r = group.iloc[0]
+                    items = ", ".join([f"{row['כמות']} X {row['מוצר']}" for _, row in group.iterrows()])
+                    line = f"{order_num} | {items} | {r['שם לקוח']} | {r['כתובת מלאה']} | {r['טלפון']} | התקנה"
+                    all_msgs.append(line)
+                if all_msgs and send_whatsapp_message(INSTALLATION_PHONE, "\n\n".join(all_msgs)):
+                    st.toast("נשלח למחסני חשמל")
+                    for _, r in rows.iterrows():
+                         update_log_in_db(r['_order_key'], r['_sku_key'], "💬 נשלח למתקין", r['_order_type_key'])
+                    time.sleep(1)
+                    st.rerun()
+
+@st.fragment
+@profiled("delivery_actions")
+def render_delivery_actions(rows_for_action, show_bulk_warning):
+    with st.popover("📦 פעולות ח' שליחויות (מיילים)", use_container_width=True):
+        # מה קורה?
+        if not show_bulk_warning and st.button("❓ מה קורה?", use_container_width=True):
+            check_actions = ["📧 נשלח בדיקה", "📧 נשלח בדיקה למתקין"]
+            if has_sent_before(rows_for_action, check_actions):
+                 st.toast("⚠️ שים לב: כבר נשלח בעבר")
+                 time.sleep(1)
+            rows = filter_recent_sends(rows_for_action, check_actions, "מה קורה")
+            
+            emails_sent = 0
+            mask_has_tracking = rows['_real_tracking'].apply(lambda x: True if (x and str(x).strip().lower() not in ['none', '', 'nan']) else False)
+            df_shipping = rows[mask_has_tracking]
+            df_installer = rows[~mask_has_tracking]
+            
+            if not df_shipping.empty:
+                trackings = list(set([str(t).strip() for t in df_shipping['_real_tracking']]))
+                subj = f"{', '.join(trackings)} מה קורה עם זה בבקשה?" if len(trackings)==1 else f"{', '.join(trackings)} מה קורה עם אלה בבקשה?"
+                if send_custom_email(subj, target_email=None):
+                    emails_sent += 1
+                    for _, r in df_shipping.iterrows():
+                        update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח בדיקה", r['_order_type_key'])
+            
+            if not df_installer.empty:
+                orders = list(set([str(o).strip() for o in df_installer['מספר הזמנה']]))
+                subj = f"{', '.join(orders)} מה קורה עם זה בבקשה?"
+                if send_custom_email(subj, target_email=EMAIL_INSTALLER):
+                    emails_sent += 1
+                    for _, r in df_installer.iterrows():
+                        update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח בדיקה למתקין", r['_order_type_key'])
+
+            if emails_sent > 0:
+                st.success(f"נשלחו {emails_sent} מיילים")
+                time.sleep(1)
+                st.rerun()
+
+        # להחזיר
+        if not show_bulk_warning and st.button("↩️ להחזיר", use_container_width=True):
+            # לא נכתב ללוג - נרשם רק בזיכרון התהליך כדי לחסום לחיצה כפולה
+            rows = filter_recent_sends(rows_for_action, ["↩️ נשלחה בקשת החזרה"], "להחזיר")
+            emails_sent = 0
+            mask_has_tracking = rows['_real_tracking'].apply(lambda x: True if (x and str(x).strip().lower() not in ['none', '', 'nan']) else False)
+            df_shipping = rows[mask_has_tracking]
+            df_installer = rows[~mask_has_tracking]
+            
+            if not df_shipping.empty:
+                trackings = list(set([str(t).strip() for t in df_shipping['_real_tracking']]))
+                subj = f"{', '.join(trackings)} להחזיר אלינו בבקשה"
+                if send_custom_email(subj, target_email=None):
+                    emails_sent += 1
+                    for key in df_shipping['_action_key']: record_action(key, "↩️ נשלחה בקשת החזרה")
+            
+            if not df_installer.empty:
+                orders = list(set([str(o).strip() for o in df_installer['מספר הזמנה']]))
+                subj = f"{', '.join(orders)} להחזיר אלינו בבקשה"
+                if send_custom_email(subj, target_email=EMAIL_INSTALLER):
+                    emails_sent += 1
+                    for key in df_installer['_action_key']: record_action(key, "↩️ נשלחה בקשת החזרה")
+
+            if emails_sent > 0:
+                st.success(f"נשלחו {emails_sent} בקשות החזרה")
+
+        # עדכון פרטים
+        if not show_bulk_warning and st.button("📝 עדכון פרטים", use_container_width=True):
+            if rows_for_action.empty: st.toast("⚠️ לא נבחרו שורות")
+            else:
+                 rows = filter_recent_sends(rows_for_action, ["📧 נשלח עדכון פרטים", "📧 נשלח עדכון למתקין"], "עדכון פרטים")
+                 if not rows.empty: open_update_dialog(rows)
+
+@st.fragment
+@profiled("supplier_actions")
+def render_supplier_actions(rows_for_action, show_bulk_warning):
+    with st.popover("📧 פעולות ספקים (מיילים)", use_container_width=True):
+        # אין מענה
+        if not show_bulk_warning and st.button("📞 אין מענה", use_container_width=True):
+            rows = filter_recent_sends(rows_for_action, ["📧 נשלח ספק (אין מענה)", "📧 נשלח ספק (ידני)"], "אין מענה")
+            ace_g = rows[rows['מספר הזמנה'].astype(str).str.upper().str.startswith("PO")]
+            pay_g = rows[rows['מספר הזמנה'].astype(str).str.startswith("9")]
+            ksp_g = rows[(rows['מספר הזמנה'].astype(str).str.startswith("31")) & (rows['מספר הזמנה'].astype(str).str.len() == 8)]
+            lp_g = rows[(rows['מספר הזמנה'].astype(str).str.startswith("32")) & (rows['מספר הזמנה'].astype(str).str.len() == 7)]
+
+            found_supplier = False
+            if not ace_g.empty and EMAIL_ACE:
+                found_supplier = True
+                u_orders = ", ".join(ace_g['מספר הזמנה'].unique())
+                u_tracking = ", ".join([t for t in ace_g['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
+                u_phones = ", ".join(ace_g['טלפון'].unique())
+                subj = f"{u_orders} {u_tracking} - אין מענה מהלקוח - האם יש מספר טלפון אחר?"
+                body = f"הטלפון שיש לנו כרגע הוא: {u_phones}\nנא בדקו אם יש מספר אחר."
+                if send_custom_email(subj, body, EMAIL_ACE):
+                    st.toast("נשלח לאייס")
+                    for _, r in ace_g.iterrows(): update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח ספק (אין מענה)", r['_order_type_key'])
+            
+            if not pay_g.empty and EMAIL_PAYNGO:
+                found_supplier = True
+                u_orders = ", ".join(pay_g['מספר הזמנה'].unique())
+                u_tracking = ", ".join([t for t in pay_g['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
+                u_phones = ", ".join(pay_g['טלפון'].unique())
+                subj = f"{u_orders} {u_tracking} - אין מענה מהלקוח - האם יש מספר טלפון אחר?"
+                body = f"הטלפון שיש לנו כרגע הוא: {u_phones}\nנא בדקו אם יש מספר אחר."
+                if send_custom_email(subj, body, EMAIL_PAYNGO):
+                    st.toast("נשלח למחסני חשמל")
+                    for _, r in pay_g.iterrows(): update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח ספק (אין מענה)", r['_order_type_key'])
+
+            if not ksp_g.empty and EMAIL_KSP:
+                found_supplier = True
+                u_orders = ", ".join(ksp_g['מספר הזמנה'].unique())
+                u_tracking = ", ".join([t for t in ksp_g['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
+                u_phones = ", ".join(ksp_g['טלפון'].unique())
+                subj = f"{u_orders} {u_tracking} - אין מענה מהלקוח - האם יש מספר טלפון אחר?"
+                body = f"הטלפון שיש לנו כרגע הוא: {u_phones}\nנא בדקו אם יש מספר אחר."
+                if send_custom_email(subj, body, EMAIL_KSP):
+                    st.toast("נשלח ל-KSP")
+                    for _, r in ksp_g.iterrows(): update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח ספק (אין מענה)", r['_order_type_key'])
+
+            if not lp_g.empty and EMAIL_LASTPRICE:
+                found_supplier = True
+                u_orders = ", ".join(lp_g['מספר הזמנה'].unique())
+                u_tracking = ", ".join([t for t in lp_g['סטטוס משלוח'].unique() if t and t!="התקנה"]) or "ללא מס' משלוח"
+                u_phones = ", ".join(lp_g['טלפון'].unique())
+                subj = f"{u_orders} {u_tracking} - אין מענה מהלקוח - האם יש מספר טלפון אחר?"
+                body = f"הטלפון שיש לנו כרגע הוא: {u_phones}\nנא בדקו אם יש מספר אחר."
+                if send_custom_email(subj, body, EMAIL_LASTPRICE):
+                    st.toast("נשלח ל-Last Price")
+                    for _, r in lp_g.iterrows(): update_log_in_db(r['_order_key'], r['_sku_key'], "📧 נשלח ספק (אין מענה)", r['_order_type_key'])
             
-    else:
-        st.warning(f"לא נמצאו תוצאות עבור: {clean_text_query}")
+            if found_supplier:
+                time.sleep(1)
+                st.rerun()
+            elif not rows.empty:
+                open_manual_supplier_dialog(rows)
+
+        # זיכוי
+        if not show_bulk_warning and st.button("💸 זיכוי", use_container_width=True):
+            if rows_for_action.empty: 
+                st.toast("⚠️ לא נבחרו שורות")
+            else:
+                rows = filter_recent_sends(rows_for_action, ["📧 נשלחה בקשת זיכוי לספק", "📧 נשלחה בקשת זיכוי (ידני)"], "זיכוי")
+                if not rows.empty: open_refund_dialog(rows)
+
+@st.fragment
+@profiled("service_actions")
+def render_service_actions(rows_for_action, show_bulk_warning):
+    with st.popover("🛠️ פעולות שירות", use_container_width=True):
+        # בטיפול
+        if not show_bulk_warning and st.button("🛠️ בטיפול", use_container_width=True):
+            if rows_for_action.empty: st.toast("⚠️ לא נבחרו הזמנות")
+            else:
+                success_count = bulk_status_transition(regular_order_ids(rows_for_action), "🛠️ סומן 'בטיפול'", set_service_start=True)
+
+                if success_count:
+                    st.toast(f"✅ {success_count} הזמנות עברו לסטטוס 'בטיפול'!", icon="👨‍🔧")
+                    time.sleep(1)
+                    st.rerun()
+                elif success_count is not None:
+                    st.toast("⚠️ לא נבחרו הזמנות רגילות לטיפול", icon="🛑")
+
+        # עבר לזיכוי
+        if not show_bulk_warning and st.button("💸 עבר לזיכוי", use_container_width=True):
+            if rows_for_action.empty: st.toast("⚠️ לא נבחרו הזמנות")
+            else:
+                success_count = bulk_status_transition(regular_order_ids(rows_for_action), "💸 עבר לזיכוי")
+
+                if success_count:
+                    st.toast(f"✅ {success_count} הזמנות סומנו 'עבר לזיכוי'!", icon="💸")
+                    time.sleep(1)
+                    st.rerun()
+                elif success_count is not None:
+                    st.toast("⚠️ לא נבחרו הזמנות רגילות לזיכוי", icon="🛑")
+
+# -------------------------------------------
+# 📋 טבלת תוצאות - סימון שורה מריץ רק את החלק הזה, לא את כל הדף
+# -------------------------------------------
+@st.fragment
+@profiled("results")
+def render_results(display_df, editor_key):
+    cols_order = [LOG_COLUMN_NAME, "נשלח לאחרונה", "הערות", "סטטוס משלוח", "מוצר", "כמות", "זמן אספקה", "מספר הזמנה", "בחר"]
+    
+    edited_df = st.data_editor(
+        display_df[cols_order],
+        key=editor_key,
+        use_container_width=False,  
+        hide_index=True,
+        column_config={
+            "בחר": st.column_config.CheckboxColumn("בחר", default=False, width="small"),
+            "מספר הזמנה": st.column_config.TextColumn("מספר הזמנה", width="medium"),
+            "זמן אספקה": st.column_config.TextColumn("זמן אספקה", width="medium"),
+            "הערות": st.column_config.TextColumn("הערות", width="medium"),
+            "כמות": st.column_config.TextColumn("כמות", width="small"),
+            "מוצר": st.column_config.TextColumn("מוצר", width="large"),
+            "סטטוס משלוח": st.column_config.TextColumn("מס משלוח", width="medium"),
+            LOG_COLUMN_NAME: st.column_config.TextColumn("לוג", disabled=True, width="large"),
+            "נשלח לאחרונה": st.column_config.TextColumn("נשלח לאחרונה", width="medium")
+        },
+        disabled=["מספר הזמנה", "מוצר", "כמות", "סטטוס משלוח", LOG_COLUMN_NAME, "נשלח לאחרונה", "זמן אספקה", "הערות"]
+    )
+
+    selected_indices = edited_df[edited_df["בחר"] == True].index
+    rows_for_action = display_df.loc[selected_indices] if not selected_indices.empty else display_df 
+    is_implicit_select_all = selected_indices.empty
+    PROFILE_META["selected_rows"] = len(selected_indices)
+    rows_for_action.attrs["profile_meta"] = {**display_df.attrs.get("profile_meta", {}), "selected_rows": len(selected_indices)}
+    show_bulk_warning = (is_implicit_select_all and len(rows_for_action) > 10)
+
+    # --- כפתורים (חלוקה חכמה עם Popovers) ---
+    st.markdown("<br>", unsafe_allow_html=True)
+    col_wa, col_delivery, col_supplier, col_system = st.columns(4, gap="small")
+
+    # 1. עמודת וואטסאפ (תפריט נפתח)
+    with col_wa:
+        render_whatsapp_actions(rows_for_action, show_bulk_warning)
+
+    # 2. עמודת חברת שליחויות (תפריט נפתח)
+    with col_delivery:
+        render_delivery_actions(rows_for_action, show_bulk_warning)
+
+    # 3. עמודת ספקים (תפריט נפתח)
+    with col_supplier:
+        render_supplier_actions(rows_for_action, show_bulk_warning)
+
+    # 4. עמודת פעולות שירות (תפריט נפתח)
+    with col_system:
+        render_service_actions(rows_for_action, show_bulk_warning)
+
+    st.divider()
+    if not rows_for_action.empty:
+        render_export_buttons(rows_for_action)
+    # הטקסט נבנה רק כשהמתג דלוק - סימון שורות לא מרכיב אותו מחדש בכל ריצה
+    if not rows_for_action.empty and not show_bulk_warning and st.toggle("📋 טקסט להעתקה", key="show_copy_text"):
+        st.caption("העתקה לאקסל:")
+        st.code("\n".join(iter_excel_lines(rows_for_action)), language="csv")
+        st.caption("פרטים מלאים:")
+        st.code("\n".join(iter_text_lines(rows_for_action)), language=None)
+
+# ==========================================
+# 🖥️ ממשק משתמש
+# ==========================================
+def main():
+    st.markdown("""
+    <style>
+        .stApp { direction: rtl; }
+        .stMarkdown, h1, h3, h2, p, label, .stRadio { text-align: right !important; direction: rtl !important; }
+        .stTextInput input { direction: rtl; text-align: right; }
+        div[data-testid="stDataEditor"] th { text-align: right !important; direction: rtl !important; }
+        div[data-testid="stDataEditor"] td { text-align: right !important; direction: rtl !important; }
+        div[class*="stDataEditor"] div[role="columnheader"] { justify-content: flex-end; }
+        div[class*="stDataEditor"] div[role="gridcell"] { text-align: right; direction: rtl; justify-content: flex-end; }
+        code { text-align: right !important; white-space: pre-wrap !important; direction: rtl !important; }
+        .stButton button { width: 100%; border-radius: 6px; height: 3em; }
+        .block-container { padding-top: 2rem; padding-bottom: 1rem; }
+    </style>
+    """, unsafe_allow_html=True)
+
+    # --- כותרת ---
+    col_title, col_refresh = st.columns([6, 1])
+    with col_title:
+        st.title("🔎 איתור הזמנות מהיר (משולב)")
+    with col_refresh:
+        st.markdown("<br>", unsafe_allow_html=True) 
+        if st.button("🔄 רענן"):
+            invalidate_data()
+            st.rerun()
+
+    try:
+        with st.spinner('טוען נתונים מהענן...'):
+            df = load_data()
+        st.success(f"הנתונים נטענו בהצלחה! סה\"כ {len(df)} שורות.")
+        PROFILE_META["dataset_rows"] = len(df)
+    except Exception as e:
+        st.error(f"שגיאה בטעינה: {e}")
+        st.stop()
+
+    # --- חיפוש ---
+    search_query = st.text_input("הכנס טלפון, מספר הזמנה או מספר משלוח:", "")
+
+    if search_query:
+        display_df, clean_text_query = get_display_df(df, search_query)
+        PROFILE_META["query"] = clean_text_query
+        PROFILE_META["matched_rows"] = 0 if display_df is None else len(display_df)
+        if display_df is not None:
+            # עובר עם הטבלה ל-fragments, כדי שגם פרופיל של לחיצה בתפריט יכלול את השאילתה
+            display_df.attrs["profile_meta"] = dict(PROFILE_META)
+
+        # --- הצגת תוצאות ---
+        if display_df is not None:
+            # מפתח קבוע לשאילתה ולגרסת הנתונים - הסימונים נשמרים עד שהנתונים עצמם משתנים
+            render_results(display_df, f"results_{get_data_version(df)}_{clean_text_query}")
+        else:
+            st.warning(f"לא נמצאו תוצאות עבור: {clean_text_query}")
 
+# פרטים שנשמרים לצד קובץ הפרופיל (רק כשהפרופיילר פעיל - ?profile=1)
+PROFILE_META = {}
 
+with profile_rerun("full_rerun", PROFILE_META):
+    main()
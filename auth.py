@@ -0,0 +1,46 @@
+import streamlit as st
+
+# ==========================================
+# 🔐 מנגנון אבטחה (Login)
+# ==========================================
+# משותף למסך החיפוש ולדפים שב-pages/ (ההתחברות נשמרת ב-session_state לכל הדפים)
+def check_password():
+    st.markdown("""
+        <style>
+            h1, h2, h3, h4, h5, h6, .stTextInput > label, .stTextInput input, div[data-testid="stMarkdownContainer"] p {
+                direction: rtl !important;
+                text-align: right !important;
+            }
+            .stTextInput > label {
+                width: 100%;
+                display: flex;
+                justify-content: flex-start;
+            }
+            .stButton button {
+                text-align: center;
+            }
+        </style>
+    """, unsafe_allow_html=True)
+
+    if "app_password" not in st.secrets:
+        st.warning("⚠️ לא הוגדרה סיסמה ב-Secrets. הכניסה חופשית.")
+        return True
+
+    def password_entered():
+        if st.session_state["password"] == st.secrets["app_password"]:
+            st.session_state["password_correct"] = True
+            del st.session_state["password"]  
+        else:
+            st.session_state["password_correct"] = False
+
+    if "password_correct" not in st.session_state:
+        st.markdown("### 🔒 התחברות למערכת")
+        st.text_input("הזמן סיסמה", type="password", on_change=password_entered, key="password")
+        return False
+    elif not st.session_state["password_correct"]:
+        st.markdown("### 🔒 התחברות למערכת")
+        st.text_input("הזמן סיסמה", type="password", on_change=password_entered, key="password")
+        st.error("❌ סיסמה שגויה")
+        return False
+    else:
+        return True
@@ -0,0 +1,111 @@
+import base64
+import itertools
+import json
+import socketserver
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+# ==========================================
+# 🧪 תחליפים מקומיים ל-UltraMsg ול-SMTP (ללא רשת)
+# ==========================================
+# השרתים רק עונים "הצלחה" אחרי השהייה שניתנת להגדרה וסופרים הודעות,
+# כך שאפשר למדוד את האפליקציה תחת עומס בלי לשלוח ללקוחות אמיתיים.
+
+class FakeUltraMsgServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, FakeUltraMsgHandler)
+        self.latency = latency
+        self.sent = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def record(self):
+        with self._lock:
+            self.sent += 1
+            return next(self._ids)
+
+class FakeUltraMsgHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        time.sleep(self.server.latency)
+
+        if not self.path.endswith("/messages/chat") or not form.get("to"):
+            body = json.dumps({"error": "bad request"}).encode("utf-8")
+            self.send_response(400)
+        else:
+            body = json.dumps({"sent": "true", "message": "ok", "id": self.server.record()}).encode("utf-8")
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, FakeSMTPHandler)
+        self.latency = latency
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def record(self):
+        with self._lock:
+            self.sent += 1
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    # מספיק מהפרוטוקול בשביל smtplib: EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, QUIT (בלי STARTTLS)
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        self.reply("220 fake-smtp ready")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            verb = line.split(" ", 1)[0].upper()
+
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif verb == "AUTH":
+                parts = line.split()
+                if len(parts) > 1 and parts[1].upper() == "LOGIN":
+                    self.reply("334 " + base64.b64encode(b"Username:").decode())
+                    self.rfile.readline()
+                    self.reply("334 " + base64.b64encode(b"Password:").decode())
+                    self.rfile.readline()
+                self.reply("235 authenticated")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 end with <CRLF>.<CRLF>")
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b".\r\n", b".\n"):
+                        break
+                time.sleep(self.server.latency)
+                self.server.record()
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+def start_fake_services(ultramsg_latency=0.0, smtp_latency=0.0, host="127.0.0.1"):
+    ultramsg = FakeUltraMsgServer((host, 0), latency=ultramsg_latency)
+    smtp = FakeSMTPServer((host, 0), latency=smtp_latency)
+    for server, name in ((ultramsg, "fake-ultramsg"), (smtp, "fake-smtp")):
+        threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    return ultramsg, smtp
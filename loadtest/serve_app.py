@@ -0,0 +1,86 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+# ==========================================
+# 🧪 שרת Streamlit אחד לבדיקת העומס (streamlit run + מדידה)
+# ==========================================
+# מופעל על ידי run_loadtest כתהליך נפרד; כל הסשנים של הבדיקה מתחברים אליו, כך שהם חולקים
+# את אותו cache_resource, pool חיבורים, executor של הסגמנטים ו-GIL - כמו בפרודקשן.
+#
+# בנוסף, בתוך התהליך:
+#   - סופר חיבורי DB שהאפליקציה פותחת לכתיבה (get_db_connection)
+#   - ה-time.sleep שבכפתורים (השהיה לפני st.rerun כדי שההודעה תיראה) מדולג כברירת מחדל
+#     ונספר בנפרד, כדי שהאחוזונים ימדדו עבודה ולא המתנה. --keep-ui-sleeps משאיר אותם.
+# המונים נכתבים לקובץ JSON (--stats-file) כל חצי שנייה.
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = REPO_ROOT / "app_search.py"
+
+stats = {"db_connects": 0, "ui_sleeps": 0, "ui_sleep_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+def patch_ui_sleeps(keep):
+    original_sleep = time.sleep
+    app_file = str(APP_PATH)
+
+    def sleep(seconds):
+        if sys._getframe(1).f_code.co_filename != app_file:
+            return original_sleep(seconds)
+        with _stats_lock:
+            stats["ui_sleeps"] += 1
+            stats["ui_sleep_seconds"] += seconds
+        if keep:
+            original_sleep(seconds)
+
+    time.sleep = sleep
+
+def patch_db_connects():
+    import orders_core
+    original_get_db_connection = orders_core.get_db_connection
+
+    def counting_get_db_connection():
+        with _stats_lock:
+            stats["db_connects"] += 1
+        return original_get_db_connection()
+
+    # app_search עושה from orders_core import get_db_connection בכל ריצה - מקבל את העטיפה
+    orders_core.get_db_connection = counting_get_db_connection
+
+def write_stats_forever(path, interval=0.5):
+    while True:
+        with _stats_lock:
+            snapshot = dict(stats)
+        Path(path).write_text(json.dumps(snapshot), encoding="utf-8")
+        time.sleep(interval)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run app_search.py under streamlit for the load test")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--secrets-file", required=True)
+    parser.add_argument("--stats-file", required=True)
+    parser.add_argument("--keep-ui-sleeps", action="store_true")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(REPO_ROOT))
+    patch_db_connects()
+    patch_ui_sleeps(args.keep_ui_sleeps)
+    threading.Thread(target=write_stats_forever, args=(args.stats_file,), name="loadtest-stats", daemon=True).start()
+
+    from streamlit.web import cli as stcli
+    sys.argv = [
+        "streamlit", "run", str(APP_PATH),
+        "--server.headless", "true",
+        "--server.address", "127.0.0.1",
+        "--server.port", str(args.port),
+        "--server.fileWatcherType", "none",
+        "--browser.gatherUsageStats", "false",
+        "--secrets.files", args.secrets_file,
+    ]
+    return stcli.main()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+import streamlit as st
+import pandas as pd
+import psycopg2
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from psycopg2.pool import ThreadedConnectionPool
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from profiling import profiling_active
+
+# ==========================================
+# ⚙️ ליבת נתונים משותפת (UI / API / CLI)
+# ==========================================
+
+SQL_TO_APP_COLS = {
+    'order_num': 'מספר הזמנה',
+    'customer_name': 'שם לקוח',
+    'phone': 'טלפון',
+    'city': 'עיר',
+    'street': 'רחוב',
+    'house_num': 'מספר בית',
+    'sku': 'מוצר',
+    'quantity': 'כמות',
+    'shipping_num': 'סטטוס משלוח',
+    'order_date': 'תאריך',
+    'message_log': 'לוג מיילים',
+    'order_type': 'סוג הזמנה',
+    'delivery_time': 'raw_delivery_time',
+    'notes': 'הערות'
+}
+APP_TO_SQL_COLS = {v: k for k, v in SQL_TO_APP_COLS.items()}
+
+LOG_COLUMN_NAME = "לוג מיילים"
+
+# עמודות אינדקס שמחושבות פעם אחת בטעינה (לא מוצגות)
+INDEX_COLUMNS = ['_search_order', '_search_tracking', '_phone_norm', '_date_sort', '_last_actions']
+
+# טבלאות המקור של all_orders_view. הסדר קובע (כמו שרשרת ה-if ב-update_log_in_db):
+# סוג הזמנה שמכיל כמה סימנים הולך לראשון שמתאים, וכל השאר הולך ל-orders.
+ORDER_TYPE_TABLES = [
+    ("Pre-Order", "pre_orders"),
+    ("Pickup", "pickups"),
+    ("Spare Part", "spare_parts"),
+    ("Double Delivery", "double_deliveries"),
+]
+DEFAULT_TABLE = "orders"
+SOURCE_TABLES = [DEFAULT_TABLE] + [table for _, table in ORDER_TYPE_TABLES]
+
+def table_for_order_type(order_type_val):
+    for marker, table in ORDER_TYPE_TABLES:
+        if marker in str(order_type_val):
+            return table
+    return DEFAULT_TABLE
+
+def _db_params():
+    return dict(
+        host=st.secrets["supabase"]["DB_HOST"],
+        port=st.secrets["supabase"]["DB_PORT"],
+        database=st.secrets["supabase"]["DB_NAME"],
+        user=st.secrets["supabase"]["DB_USER"],
+        password=st.secrets["supabase"]["DB_PASS"],
+        sslmode=st.secrets["supabase"].get("DB_SSLMODE", "require")
+    )
+
+def get_db_connection():
+    return psycopg2.connect(**_db_params())
+
+# Pool לקריאות - חיבור אחד לכל טבלה שנטענת במקביל
+@st.cache_resource(show_spinner=False)
+def get_db_pool():
+    return ThreadedConnectionPool(1, len(SOURCE_TABLES), **_db_params())
+
+# --- פונקציות נרמול ---
+def normalize_phone(phone_input):
+    if not phone_input: return ""
+    clean_digits = ''.join(filter(str.isdigit, str(phone_input)))
+    if clean_digits.startswith('972'): clean_digits = clean_digits[3:]
+    if clean_digits.startswith('0'): return clean_digits[1:]
+    return clean_digits
+
+def normalize_phone_for_api(phone_input):
+    if not phone_input: return None
+    digits = ''.join(filter(str.isdigit, str(phone_input)))
+    if not digits: return None
+    if digits.startswith('972'): return digits
+    if digits.startswith('0'): return '972' + digits[1:]
+    if len(digits) == 9: return '972' + digits
+    return digits
+
+def clean_input_garbage(val):
+    if not isinstance(val, str): val = str(val)
+    garbage_chars = ['\u200f', '\u200e', '\u202a', '\u202b', '\u202c', '\u202d', '\u202e', '\u00a0', '\t', '\n', '\r']
+    cleaned_val = val
+    for char in garbage_chars:
+        cleaned_val = cleaned_val.replace(char, '')
+    return cleaned_val.strip()
+
+def format_date_il(d):
+    if not d: return ""
+    try:
+        dt = pd.to_datetime(d)
+        return dt.strftime('%d/%m/%Y')
+    except:
+        return str(d)
+
+def format_quantity(q):
+    try:
+        return str(int(float(q)))
+    except:
+        return str(q).replace('.0', '')
+
+def has_real_tracking(val):
+    return bool(val) and str(val).strip().lower() not in ['none', '', 'nan']
+
+def supplier_for_order(order_num):
+    # אותם כללי קידומת כמו בשליחה לספקים ("אין מענה" / זיכוי)
+    order_num = str(order_num).strip()
+    if order_num.upper().startswith("PO"): return "אייס"
+    if order_num.startswith("9"): return "מחסני חשמל"
+    if order_num.startswith("31") and len(order_num) == 8: return "KSP"
+    if order_num.startswith("32") and len(order_num) == 7: return "Last Price"
+    return "אחר"
+
+# -------------------------------------------
+# 🗂️ אינדקס פעולות מתוך לוג ההודעות
+# -------------------------------------------
+# רשומה בלוג: "<פעולה> (dd/mm HH:MM)", מופרדות ב-" | " (ראו update_log_in_db)
+LOG_ENTRY_RE = re.compile(r"^(?P<action>.+?) \((?P<day>\d{1,2})/(?P<month>\d{1,2}) (?P<hour>\d{1,2}):(?P<minute>\d{2})\)$")
+
+def parse_message_log(log, now=None):
+    # -> {פעולה: הפעם האחרונה שבוצעה}. בלוג אין שנה: מניחים את השנה הנוכחית,
+    # ותאריך שיוצא בעתיד שייך לשנה הקודמת.
+    if not log:
+        return {}
+    now = now or datetime.now()
+    last = {}
+    for entry in str(log).split(" | "):
+        m = LOG_ENTRY_RE.match(entry.strip())
+        if not m:
+            continue
+        try:
+            ts = datetime(now.year, int(m["month"]), int(m["day"]), int(m["hour"]), int(m["minute"]))
+            if ts > now + timedelta(days=1):
+                ts = ts.replace(year=now.year - 1)
+        except ValueError:
+            continue
+        action = m["action"].strip()
+        if action not in last or ts > last[action]:
+            last[action] = ts
+    return last
+
+def action_key(order_num, sku, order_type_val):
+    # מזהה שורה כמו ש-update_log_in_db מוצא אותה: טבלה + מספר הזמנה + מק"ט
+    return f"{table_for_order_type(order_type_val)}|{str(order_num).strip()}|{str(sku).strip()}"
+
+# פעולות שבוצעו בתהליך הזה ועוד לא נטענו מחדש מה-DB (לחיצה כפולה / סשן אחר באותו רגע)
+@st.cache_resource(show_spinner=False)
+def _recent_actions():
+    return {"lock": threading.Lock(), "actions": {}}
+
+def record_action(key, action, when=None):
+    store = _recent_actions()
+    when = when or datetime.now()
+    with store["lock"]:
+        store["actions"].setdefault(key, {})[action] = when
+        if len(store["actions"]) > 5000:
+            cutoff = when - timedelta(days=1)
+            store["actions"] = {k: v for k, v in store["actions"].items() if max(v.values()) > cutoff}
+
+def merged_last_actions(key, last_actions):
+    recent = _recent_actions()["actions"].get(key)
+    if not recent:
+        return last_actions or {}
+    merged = dict(last_actions or {})
+    for action, ts in recent.items():
+        if action not in merged or ts > merged[action]:
+            merged[action] = ts
+    return merged
+
+def last_action_time(key, last_actions, actions):
+    merged = merged_last_actions(key, last_actions)
+    times = [merged[a] for a in actions if a in merged]
+    return max(times) if times else None
+
+# -------------------------------------------
+# 📥 טעינת נתונים + אינדקסים
+# -------------------------------------------
+def build_search_index(df):
+    # מחושב פעם אחת לכל טעינה - החיפוש עצמו רק משווה מול העמודות האלה
+    df['_search_order'] = df['מספר הזמנה'].astype(str).str.lower()
+    df['_search_tracking'] = df['סטטוס משלוח'].astype(str).str.lower()
+    df['_phone_norm'] = df['טלפון'].astype(str).map(normalize_phone)
+    df['_date_sort'] = pd.to_datetime(df['תאריך'], errors='coerce')
+    return df
+
+def build_action_index(df):
+    # גם הלוג מפוענח פעם אחת לטעינה - בדיקות כפילות לא סורקות מחרוזות בזמן לחיצה
+    now = datetime.now()
+    df['_last_actions'] = [parse_message_log(log, now) for log in df[LOG_COLUMN_NAME]]
+    return df
+
+def _segment_filter(table):
+    # אותה חלוקה כמו table_for_order_type, כדי שכל שורה ב-view תשייך לסגמנט אחד בלבד.
+    # הערכים נכנסים כליטרלים, כך ש-Postgres מקפל את התנאי ומדלג על ענפי ה-UNION של טבלאות אחרות.
+    conditions, params = [], []
+    for marker, marker_table in ORDER_TYPE_TABLES:
+        if marker_table == table:
+            conditions.append("strpos(COALESCE(order_type, ''), %s) > 0")
+            params.append(marker)
+            break
+        conditions.append("strpos(COALESCE(order_type, ''), %s) = 0")
+        params.append(marker)
+    return " AND ".join(conditions), params
+
+def _fetch_segment(pool, table):
+    where_sql, params = _segment_filter(table)
+    query = f"""
+        SELECT
+            id, order_num, customer_name, phone, city, street, house_num,
+            sku, quantity, shipping_num, order_date, message_log, order_type, delivery_time, notes
+        FROM all_orders_view
+        WHERE {where_sql}
+    """
+    for attempt in range(2):
+        conn = pool.getconn()
+        try:
+            df = pd.read_sql(query, conn, params=params)
+            pool.putconn(conn)
+            return df
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # חיבור שנסגר בצד השרת בזמן שחיכה ב-pool - זורקים ומנסים שוב עם חדש
+            pool.putconn(conn, close=True)
+            if attempt:
+                raise
+        except Exception:
+            pool.putconn(conn)
+            raise
+
+# כל טבלת מקור נשמרת בנפרד עם גרסה משלה: כתיבה ל-pickups מנקה רק את load_segment("pickups").
+# cache_resource ולא cache_data: אובייקט אחד משותף לכל הסשנים ולשרת ה-API,
+# בלי העתקה (pickle) של הטבלה בכל קריאה. אסור לשנות את ה-DataFrame במקום.
+@st.cache_resource(show_spinner=False)
+def load_segment(table):
+    # הגרסה = תחילת השליפה: כתיבה שסומנה לפניה כבר נמצאת בנתונים (ראו _segment_aggregates)
+    version = time.time_ns()
+    df = _fetch_segment(get_db_pool(), table)
+
+    df = df.rename(columns=SQL_TO_APP_COLS)
+    df = df.fillna("")
+    if LOG_COLUMN_NAME not in df.columns:
+        df[LOG_COLUMN_NAME] = ""
+
+    df = build_search_index(df)
+    df = build_action_index(df)
+    df.attrs["data_version"] = version
+    return df
+
+_segment_executor = ThreadPoolExecutor(max_workers=len(SOURCE_TABLES), thread_name_prefix="load-segment")
+
+def _load_segment_in_thread(ctx, table):
+    if ctx:
+        add_script_run_ctx(threading.current_thread(), ctx)
+    try:
+        return load_segment(table)
+    finally:
+        if ctx:
+            add_script_run_ctx(threading.current_thread(), None)
+
+# איחוד הסגמנטים נשמר לפי צירוף הגרסאות, כך שה-concat רץ רק כשאחד מהם השתנה
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _combine_segments(versions, _segments):
+    df = pd.concat(_segments, ignore_index=True)
+    df.attrs["data_version"] = versions
+    return df
+
+def load_segments():
+    # בריצה שנמדדת - טעינה על ה-thread של הסשן, אחרת הפרופיילר רואה רק המתנה ל-executor
+    if profiling_active():
+        return [load_segment(table) for table in SOURCE_TABLES]
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return list(_segment_executor.map(partial(_load_segment_in_thread, ctx), SOURCE_TABLES))
+
+def load_data():
+    segments = load_segments()
+    versions = tuple(get_data_version(seg) for seg in segments)
+    return _combine_segments(versions, segments)
+
+def invalidate_data(table=None, row_ids=None):
+    # בלי טבלה - טעינה מחדש של הכל (כפתור רענן), כולל ספירה מלאה של המונים.
+    # row_ids = השורות שהכתיבה שינתה: המונים של הטבלה מתעדכנים רק עבורן
+    if table:
+        load_segment.clear(table)
+    else:
+        load_segment.clear()
+    _mark_aggregates_stale(table, row_ids)
+
+# גרסת הנתונים - מתחלפת בכל טעינה מחדש (בטבלה המאוחדת: tuple של גרסאות הסגמנטים),
+# משמשת כמפתח ל-memoization
+def get_data_version(df):
+    return df.attrs.get("data_version", 0)
+
+# -------------------------------------------
+# 🔎 חיפוש (משותף ל-UI ול-API)
+# -------------------------------------------
+def search_orders(df, search_query):
+    clean_text_query = clean_input_garbage(search_query)
+    if not clean_text_query:
+        return df.iloc[0:0], clean_text_query
+    clean_phone_query = normalize_phone(clean_text_query)
+    needle = clean_text_query.lower()
+
+    # 1. חיפוש הזמנה  2. חיפוש משלוח
+    final_mask = df['_search_order'].str.contains(needle, na=False, regex=False)
+    final_mask |= df['_search_tracking'].str.contains(needle, na=False, regex=False)
+
+    # 3. חיפוש טלפון
+    if clean_phone_query:
+        final_mask |= df['_phone_norm'] == clean_phone_query
+
+    filtered_df = df[final_mask]
+    filtered_df = filtered_df.sort_values(by='_date_sort', ascending=True, kind='stable')
+    return filtered_df, clean_text_query
+
+def rows_to_records(filtered_df):
+    # פלט JSON עם שמות העמודות המקוריים מה-SQL
+    out = filtered_df.drop(columns=INDEX_COLUMNS, errors='ignore').rename(columns=APP_TO_SQL_COLS)
+    return out.to_dict(orient='records')
+
+# -------------------------------------------
+# 📊 מונים תפעוליים (ללוח הבקרה)
+# -------------------------------------------
+# סימונים מ-bulk_status_transition: זיכוי סוגר הזמנה, "בטיפול" משאיר אותה פעילה גם כשהיא ותיקה.
+# מה נחשב "פתוחה" (חלון תאריכים) מחושב בלוח הבקרה, לא כאן.
+CLOSED_ACTIONS = ["💸 עבר לזיכוי"]
+IN_SERVICE_ACTIONS = ["🛠️ סומן 'בטיפול'"]
+AGGREGATE_KEYS = ["table", "supplier", "order_date", "has_tracking", "closed", "in_service"]
+
+# מונים לפי (ספק, תאריך הזמנה, יש מס' משלוח, סימוני סטטוס) לכל סגמנט בנפרד.
+# ספירה מלאה רק בטעינה הראשונה ובכפתור רענן; אחרי כתיבה מורידים את המפתח הישן של השורות
+# שהשתנו ומוסיפים את החדש. נשמר לפי תאריך ולא לפי גיל, כדי שהמונים לא יתיישנו כשמתחלף היום.
+def _aggregate_keys(table, rows):
+    return pd.DataFrame({
+        "table": table,
+        "supplier": rows['מספר הזמנה'].map(supplier_for_order),
+        "order_date": pd.to_datetime(rows['_date_sort'], errors='coerce').dt.normalize(),
+        "has_tracking": rows['סטטוס משלוח'].map(has_real_tracking).astype(bool),
+        "closed": rows['_last_actions'].map(lambda actions: any(a in actions for a in CLOSED_ACTIONS)).astype(bool),
+        "in_service": rows['_last_actions'].map(lambda actions: any(a in actions for a in IN_SERVICE_ACTIONS)).astype(bool),
+    }, columns=AGGREGATE_KEYS).set_axis(rows['id'])
+
+def _count_keys(keys):
+    counts = keys.groupby(AGGREGATE_KEYS, dropna=False).size().reset_index(name="count")
+    return dict(zip(counts[AGGREGATE_KEYS].itertuples(index=False, name=None), counts["count"]))
+
+def _counts_frame(counts):
+    frame = pd.DataFrame([(*key, n) for key, n in counts.items()], columns=AGGREGATE_KEYS + ["count"])
+    frame["order_date"] = pd.to_datetime(frame["order_date"])
+    return frame.astype({"has_tracking": bool, "closed": bool, "in_service": bool})
+
+# מצב המונים לכל טבלה (מפתח לכל שורה לפי id + ספירה), ושורות שנכתבו ועוד לא נספרו מחדש
+@st.cache_resource(show_spinner=False)
+def _aggregate_store():
+    return {"lock": threading.Lock(), "tables": {}, "touched": {}}
+
+def _mark_aggregates_stale(table, row_ids):
+    store = _aggregate_store()
+    marked_at = time.time_ns()
+    with store["lock"]:
+        if not table:
+            store["tables"].clear()
+            store["touched"].clear()
+        elif row_ids is None:
+            store["tables"].pop(table, None)  # לא ידוע מה השתנה - ספירה מלאה של הטבלה
+        else:
+            store["touched"].setdefault(table, {}).update({row_id: marked_at for row_id in row_ids})
+
+def _segment_aggregates(store, table, segment):
+    version = get_data_version(segment)
+    state = store["tables"].get(table)
+    if state is not None and state["version"] == version:
+        return state["frame"]
+
+    touched = store["touched"].get(table, {})
+    if state is None:
+        keys = _aggregate_keys(table, segment)
+        counts = _count_keys(keys)
+    else:
+        keys, counts = state["keys"], state["counts"]
+        ids = list(touched)
+        old = keys[keys.index.isin(ids)]
+        new = _aggregate_keys(table, segment[segment['id'].isin(ids)])
+        for key, n in _count_keys(old).items():
+            counts[key] -= n
+            if not counts[key]:
+                del counts[key]
+        for key, n in _count_keys(new).items():
+            counts[key] = counts.get(key, 0) + n
+        keys = pd.concat([keys[~keys.index.isin(ids)], new])
+
+    # כתיבה שסומנה אחרי תחילת השליפה אולי לא נכנסה לסגמנט הזה - נשארת לגרסה הבאה
+    store["touched"][table] = {row_id: at for row_id, at in touched.items() if at >= version}
+    state = {"version": version, "keys": keys, "counts": counts, "frame": _counts_frame(counts)}
+    store["tables"][table] = state
+    return state["frame"]
+
+def load_aggregates():
+    # טבלה קטנה (אלפי שורות לכל היותר) - החיתוכים בלוח הבקרה רצים עליה ולא על כל הנתונים
+    store = _aggregate_store()
+    segments = load_segments()
+    with store["lock"]:
+        parts = [_segment_aggregates(store, table, seg) for table, seg in zip(SOURCE_TABLES, segments)]
+    return pd.concat(parts, ignore_index=True)
+
@@ -0,0 +1,122 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+
+from orders_core import load_aggregates, invalidate_data
+from auth import check_password
+from profiling import profile_rerun
+
+st.set_page_config(layout="wide", page_title="לוח בקרה", page_icon="📊")
+
+if not check_password():
+    st.stop()
+
+# ==========================================
+# 📊 לוח בקרה תפעולי
+# ==========================================
+# הכל מחושב מ-load_aggregates (מונים לכל סגמנט שמתעדכנים לפי השורות שנכתבו) - בלי groupby על כל ההיסטוריה בכל צפייה.
+
+TABLE_LABELS = {
+    "orders": "רגילה",
+    "pre_orders": "Pre-Order",
+    "pickups": "איסוף",
+    "spare_parts": "חלקי חילוף",
+    "double_deliveries": "משלוח כפול",
+}
+
+# פתוחה = לא עברה לזיכוי, וגם הוזמנה בחלון הימים האחרונים או סומנה "בטיפול".
+# אין בנתונים סטטוס "נמסר", אז הזמנה ישנה בלי טיפול פעיל נחשבת סגורה.
+OPEN_WINDOW_DAYS = int(st.secrets["dashboard"].get("open_window_days", 60)) if "dashboard" in st.secrets else 60
+STALE_DAYS = 30
+AGE_BINS = [-float("inf"), 7, 14, 30, 60, float("inf")]
+AGE_LABELS = ["עד 7 ימים", "8-14 ימים", "15-30 ימים", "31-60 ימים", "מעל 60 ימים"]
+NO_DATE_LABEL = "ללא תאריך"
+
+SUMMARY_COLUMNS = {
+    "count": "פתוחות",
+    "no_tracking": "ללא מס' משלוח",
+    "waiting_installer": "ממתינות למתקין",
+    "stale": f"מעל {STALE_DAYS} ימים",
+}
+
+def with_open_flag(agg, today):
+    # הגיל מחושב כאן ולא במונים, כדי שיתעדכן כשמתחלף היום
+    agg = agg.assign(age_days=(today - agg["order_date"]).dt.days)
+    agg["is_open"] = ~agg["closed"] & (agg["in_service"] | (agg["age_days"] <= OPEN_WINDOW_DAYS))
+    return agg
+
+def open_orders_view(agg):
+    open_df = agg[agg["is_open"]].copy()
+    age_days = open_df["age_days"]
+    open_df["age"] = pd.cut(age_days, AGE_BINS, labels=AGE_LABELS).cat.add_categories(NO_DATE_LABEL).fillna(NO_DATE_LABEL)
+    open_df["type"] = open_df["table"].map(TABLE_LABELS)
+    open_df["no_tracking"] = open_df["count"].where(~open_df["has_tracking"], 0)
+    # הזמנה רגילה בלי מס' משלוח = "התקנה" בטבלת החיפוש
+    open_df["waiting_installer"] = open_df["no_tracking"].where(open_df["table"] == "orders", 0)
+    open_df["stale"] = open_df["count"].where(age_days > STALE_DAYS, 0)
+    return open_df
+
+def summarize(open_df, by, label, sort=True):
+    summary = open_df.groupby(by, observed=False)[list(SUMMARY_COLUMNS)].sum()
+    if sort:
+        summary = summary.sort_values("count", ascending=False)
+    return summary.rename(columns=SUMMARY_COLUMNS).rename_axis(label)
+
+def main():
+    st.markdown("""
+    <style>
+        .stApp { direction: rtl; }
+        .stMarkdown, h1, h3, h2, p, label { text-align: right !important; direction: rtl !important; }
+        .stButton button { width: 100%; border-radius: 6px; height: 3em; }
+        .block-container { padding-top: 2rem; padding-bottom: 1rem; }
+    </style>
+    """, unsafe_allow_html=True)
+
+    col_title, col_refresh = st.columns([6, 1])
+    with col_title:
+        st.title("📊 לוח בקרה תפעולי")
+        st.caption(f"פתוחה = הוזמנה ב-{OPEN_WINDOW_DAYS} הימים האחרונים או סומנה 'בטיפול', ולא עברה לזיכוי. "
+                   f"'ממתינות למתקין' = הזמנה רגילה בלי מס' משלוח.")
+    with col_refresh:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("🔄 רענן"):
+            invalidate_data()
+            st.rerun()
+
+    try:
+        with st.spinner('טוען נתונים מהענן...'):
+            agg = load_aggregates()
+    except Exception as e:
+        st.error(f"שגיאה בטעינה: {e}")
+        st.stop()
+
+    agg = with_open_flag(agg, pd.Timestamp(datetime.now().date()))
+    open_df = open_orders_view(agg)
+    totals = open_df[list(SUMMARY_COLUMNS)].sum()
+    PROFILE_META["aggregate_rows"] = len(agg)
+    PROFILE_META["open_orders"] = int(totals["count"])
+
+    for col, key in zip(st.columns(len(SUMMARY_COLUMNS)), SUMMARY_COLUMNS):
+        col.metric(SUMMARY_COLUMNS[key], f"{int(totals[key]):,}")
+
+    col_supplier, col_type = st.columns(2, gap="large")
+    with col_supplier:
+        st.subheader("לפי ספק")
+        st.dataframe(summarize(open_df, "supplier", "ספק"), use_container_width=True)
+    with col_type:
+        st.subheader("לפי סוג הזמנה")
+        st.dataframe(summarize(open_df, "type", "סוג הזמנה"), use_container_width=True)
+
+    st.subheader("לפי גיל (מתאריך ההזמנה)")
+    by_age = summarize(open_df, "age", "גיל", sort=False)
+    st.bar_chart(by_age[SUMMARY_COLUMNS["count"]])
+    st.dataframe(by_age, use_container_width=True)
+
+    closed = int(agg.loc[agg["closed"], "count"].sum())
+    inactive = int(agg.loc[~agg["is_open"] & ~agg["closed"], "count"].sum())
+    st.caption(f"לא כולל {closed:,} הזמנות שעברו לזיכוי ו-{inactive:,} הזמנות ותיקות (או בלי תאריך) בלי סימון 'בטיפול'.")
+
+PROFILE_META = {}
+
+with profile_rerun("dashboard", PROFILE_META):
+    main()
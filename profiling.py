@@ -0,0 +1,130 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+# ==========================================
+# ⏱️ פרופיילר לריצה בודדת (opt-in)
+# ==========================================
+# כבוי כברירת מחדל: נדרש [profiling] enabled = true ב-Secrets (הקבצים נכתבים לדיסק השרת,
+# וה-json שלצדם כולל את השאילתה - כלומר טלפונים של לקוחות). רק בסביבת פיתוח / בדיקה.
+# כשמופעל: ?profile=1 בכתובת - הריצה הבאה בלבד נמדדת, ואז המתג יורד מהכתובת.
+# ?profile=N מודד את N הריצות הבאות בסשן (עד 20), למשל 2 = ריצה מלאה + לחיצה בתפריט פעולות.
+# כל ריצה שנמדדת (מלאה או fragment) נשמרת לתיקייה profiles/:
+#   - עם pyinstrument (ב-requirements; דוגם, כמעט לא מאט): ‎.html עם עץ/flamegraph
+#     ו-‎.speedscope.json שנפתח ב-https://www.speedscope.app
+#   - בלי pyinstrument: ‎.pstats של cProfile (snakeviz / flameprof) - מאט את הריצה הנמדדת
+# לצד כל קובץ נשמר ‎.json עם השאילתה, כמויות השורות ומשך הריצה.
+# הפרופיילר דוגם רק את ה-thread של הסשן, ולכן בריצה שנמדדת הסגמנטים נטענים ברצף על ה-thread הזה
+# ולא ב-executor המקבילי - כך read_sql והאינדקסים מופיעים בפרופיל. טעינה קרה שנמדדת איטית יותר מרגילה.
+
+_state = threading.local()
+
+MAX_PROFILED_RUNS = 20
+
+def _profiling_allowed():
+    return "profiling" in st.secrets and st.secrets["profiling"].get("enabled", False) is True
+
+def profiling_active():
+    # True בתוך ריצה שנמדדת (על ה-thread של הסשן)
+    return getattr(_state, "active", False)
+
+def _requested_runs(raw):
+    raw = str(raw).lower()
+    if raw in ("true", "yes"):
+        return 1
+    return min(int(raw), MAX_PROFILED_RUNS) if raw.isdigit() else 0
+
+def take_profiled_run():
+    # מוריד ריצה אחת מהתקציב של ?profile=N בסשן הנוכחי; True אם הריצה הזו נמדדת
+    raw = st.query_params.get("profile")
+    if raw is None or not _profiling_allowed():
+        st.session_state.pop("_profiled_runs_left", None)
+        return False
+    left = st.session_state.get("_profiled_runs_left", _requested_runs(raw)) - 1
+    if left <= 0:
+        del st.query_params["profile"]
+        st.session_state.pop("_profiled_runs_left", None)
+    else:
+        st.session_state["_profiled_runs_left"] = left
+    return left >= 0
+
+def _profile_dir():
+    path = st.secrets["profiling"].get("dir", "profiles") if "profiling" in st.secrets else "profiles"
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return "cprofile", profiler
+    profiler = Profiler(interval=0.001, async_mode="disabled")
+    profiler.start()
+    return "pyinstrument", profiler
+
+def _save_profile(kind, profiler, label, meta, elapsed):
+    base = os.path.join(_profile_dir(), f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{label}")
+    if kind == "pyinstrument":
+        from pyinstrument.renderers import SpeedscopeRenderer
+        with open(f"{base}.html", "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        with open(f"{base}.speedscope.json", "w", encoding="utf-8") as f:
+            f.write(profiler.output(SpeedscopeRenderer()))
+    else:
+        profiler.dump_stats(f"{base}.pstats")
+
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump({"label": label, "profiler": kind, "elapsed_ms": round(elapsed * 1000, 1),
+                   "segment_loading": "inline", **meta},
+                  f, ensure_ascii=False, indent=2, default=str)
+    return base
+
+@contextmanager
+def profile_rerun(label, meta):
+    # meta הוא dict שהקוד בתוך הבלוק ממלא (שאילתה, שורות...) - נשמר רק בסוף הריצה.
+    # פרופיילר אחד בכל פעם: fragment שרץ בתוך ריצה מלאה כבר מכוסה על ידה.
+    if profiling_active() or not take_profiled_run():
+        yield
+        return
+
+    _state.active = True
+    kind, profiler = _start_profiler()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        # גם כש-st.rerun / st.stop קוטעים את הריצה
+        elapsed = time.perf_counter() - started
+        if kind == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        _state.active = False
+        try:
+            path = _save_profile(kind, profiler, label, meta, elapsed)
+            print(f"Profile saved: {path} ({elapsed * 1000:.0f} ms)")
+        except Exception as e:
+            print(f"Error saving profile: {e}")
+
+def profiled(label):
+    # לעטיפת fragments: לחיצה בתפריט מריצה רק את ה-fragment, אז הוא נמדד לבד.
+    # השאילתה והכמויות מגיעות מ-attrs["profile_meta"] של הטבלה שה-fragment מקבל.
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            meta = dict(getattr(args[0], "attrs", {}).get("profile_meta", {})) if args else {}
+            if args and hasattr(args[0], "__len__"):
+                meta["rows"] = len(args[0])
+            with profile_rerun(label, meta):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator